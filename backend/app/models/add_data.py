@@ -1,6 +1,17 @@
+"""Sample data for demos and local development.
+
+Run ``python -m backend.app.models.add_data`` to fill an empty database,
+or add ``--reset`` to replace whatever is there.
+"""
+import logging
 import random
 from typing import List
-from .database import Student, Class, Section
+from .database import Student, Class, Section, Grade, IdSequence, DataVersion
+from ..services.rank_engine import RankEngine
+from ..services.id_allocator import STUDENT_SEQUENCE
+from ..services.versions import CATALOG_VERSION, class_version
+
+logger = logging.getLogger(__name__)
 
 def generate_name():
     first_names = ["James", "Emma", "Liam", "Olivia", "Noah", "Ava", "William", "Sophia", "Mason", "Isabella",
@@ -222,6 +233,7 @@ def create_sample_data(db):
     db.commit()
     
     # Create 50 students
+    students = []
     for i in range(30):
         # Basic info
         name = generate_name()
@@ -239,12 +251,10 @@ def create_sample_data(db):
         # Generate homework data
         homework_completed, homework_points = generate_homework_data()
         
-        # Academic performance
-        academic_performance = {
-            "rank": "Top 5%" if gpa >= 3.7 else "Top 10%" if gpa >= 3.3 else "Top 25%" if gpa >= 3.0 else "Average",
-            "tests": test_scores,
-            "homework": generate_test_scores(random.randint(4, 8))  # Different homework assignments
-        }
+        # Academic performance; individual scores are stored as grades rows and
+        # the rank is filled in once the whole cohort is known
+        academic_performance = {}
+        homework_scores = generate_test_scores(random.randint(4, 8))  # Different homework assignments
         
         # AI insights with more detailed analysis
         ai_insights = generate_ai_insights(gpa, attendance_percentage, homework_completed)
@@ -262,9 +272,70 @@ def create_sample_data(db):
             homework_points=homework_points,
             homework_completed=homework_completed,
             academic_performance=academic_performance,
-            ai_insights=ai_insights
+            ai_insights=ai_insights,
+            test_count=len(test_scores),
+            test_total=sum(int(score.rstrip('%')) for score in test_scores.values()),
+            homework_count=len(homework_scores),
+            homework_total=sum(int(score.rstrip('%')) for score in homework_scores.values())
         )
         
         db.add(student)
+        students.append(student)
+        
+        for grade_type, scores in (("test", test_scores), ("homework", homework_scores)):
+            for test_name, score in scores.items():
+                percentage = int(score.rstrip('%'))
+                db.add(Grade(
+                    student_id=student.id,
+                    grade_type=grade_type,
+                    name=test_name,
+                    score=percentage,
+                    total_points=100,
+                    percentage=percentage
+                ))
+    
+    # Rank each student within their class and grade level
+    ranks = RankEngine()
+    ranks.load((student.id, student.class_id, student.grade, student.gpa) for student in students)
+    for student in students:
+        student.academic_performance = {"rank": ranks.rank(student.id)}
+    
+    # New students get IDs after the sample ones
+    db.add(IdSequence(name=STUDENT_SEQUENCE, value=len(students)))
+    
+    # Invalidate clients' ETags, which may predate a --reset
+    for name in [CATALOG_VERSION] + [class_version(class_data["id"]) for class_data in classes]:
+        version = db.get(DataVersion, name)
+        if version is None:
+            db.add(DataVersion(name=name, version=1))
+        else:
+            version.version += 1
     
     db.commit()
+
+if __name__ == "__main__":
+    import argparse
+    from .database import Base, SessionLocal, engine, init_db
+
+    parser = argparse.ArgumentParser(description="Load sample classes, sections and students")
+    parser.add_argument("--reset", action="store_true", help="delete all existing data first")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    init_db()
+    if args.reset:
+        # Version counters survive so cached ETags can't match the new data
+        tables = [table for table in Base.metadata.sorted_tables if table.name != DataVersion.__tablename__]
+        Base.metadata.drop_all(bind=engine, tables=tables)
+        Base.metadata.create_all(bind=engine)
+        logger.info("Dropped existing data")
+
+    db = SessionLocal()
+    try:
+        if db.query(Class).first() is not None:
+            logger.info("Database already has data; pass --reset to replace it")
+        else:
+            create_sample_data(db)
+            logger.info("Sample data added successfully")
+    finally:
+        db.close()
@@ -0,0 +1,188 @@
+"""Schema versioning and in-place upgrades for existing databases.
+
+init_db() applies pending migrations on startup. Run
+``python -m backend.app.models.migrations`` to bring an existing database
+(e.g. an old edutrack.db) up to the current schema without starting the app.
+"""
+from sqlalchemy import MetaData, Table, Column, Integer, inspect, text
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tracked separately from Base.metadata so drop_all/create_all leave it alone
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, nullable=False)
+)
+
+def get_schema_version(connection) -> int:
+    """Current schema version; databases created before versioning count as version 1."""
+    inspector = inspect(connection)
+    if not inspector.has_table("schema_version"):
+        return 1 if inspector.has_table("students") else 0
+    version = connection.execute(schema_version.select()).scalar()
+    return version or 1
+
+def set_schema_version(connection, version: int):
+    version_metadata.create_all(bind=connection)
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=version))
+
+def rebuild_sqlite_table(connection, table):
+    """Recreate a table from its model definition, keeping its rows.
+
+    SQLite can't add constraints such as foreign keys to an existing table,
+    so the table is renamed, recreated with its indexes and copied back.
+    """
+    inspector = inspect(connection)
+    old_name = f"_{table.name}_old"
+    old_columns = {column["name"] for column in inspector.get_columns(table.name)}
+    old_indexes = [index["name"] for index in inspector.get_indexes(table.name) if index.get("name")]
+
+    connection.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+    for index_name in old_indexes:
+        connection.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+    table.create(bind=connection)
+
+    columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in old_columns)
+    connection.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old_name}"'))
+    connection.execute(text(f'DROP TABLE "{old_name}"'))
+
+def _v2_indexes_and_foreign_keys(connection):
+    from .database import Student
+
+    # Drop duplicate sections before enforcing uniqueness, keeping the oldest row
+    connection.execute(text(
+        "DELETE FROM sections WHERE id NOT IN "
+        "(SELECT MIN(id) FROM sections GROUP BY class_id, name)"
+    ))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_sections_class_id_name ON sections (class_id, name)"
+    ))
+
+    if connection.dialect.name == "sqlite":
+        # Also creates ix_students_class_id
+        rebuild_sqlite_table(connection, Student.__table__)
+    else:
+        connection.execute(text(
+            "ALTER TABLE students ADD CONSTRAINT students_class_id_fkey "
+            "FOREIGN KEY (class_id) REFERENCES classes (id)"
+        ))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_students_class_id ON students (class_id)"))
+
+def _parse_percentage(value) -> int:
+    return int(str(value).rstrip('%'))
+
+def _v3_grades_table(connection):
+    """Move test/homework scores out of the academic_performance JSON into grades rows."""
+    from .database import Grade
+
+    Grade.__table__.create(bind=connection, checkfirst=True)
+    rows = connection.execute(text("SELECT id, academic_performance FROM students")).fetchall()
+    for student_id, raw_performance in rows:
+        performance = json.loads(raw_performance) if raw_performance else {}
+        grades = []
+        for grade_type, key in (("test", "tests"), ("homework", "homework")):
+            for name, value in (performance.pop(key, None) or {}).items():
+                percentage = _parse_percentage(value)
+                grades.append({
+                    "student_id": student_id,
+                    "grade_type": grade_type,
+                    "name": name,
+                    "score": percentage,
+                    "total_points": 100,
+                    "percentage": percentage,
+                    "date": None
+                })
+        if grades:
+            connection.execute(Grade.__table__.insert(), grades)
+        connection.execute(
+            text("UPDATE students SET academic_performance = :performance WHERE id = :id"),
+            {"performance": json.dumps(performance), "id": student_id}
+        )
+
+def _v4_running_aggregates(connection):
+    """Add per-student grade counters and backfill them from the grades table."""
+    # Earlier SQLite table rebuilds use the current model, so the columns may already exist
+    existing = {column["name"] for column in inspect(connection).get_columns("students")}
+    for column in ("test_count", "test_total", "homework_count", "homework_total"):
+        if column not in existing:
+            connection.execute(text(f"ALTER TABLE students ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+    for grade_type, prefix in (("test", "test"), ("homework", "homework")):
+        connection.execute(text(
+            f"UPDATE students SET "
+            f"{prefix}_count = (SELECT COUNT(*) FROM grades "
+            f"WHERE grades.student_id = students.id AND grades.grade_type = :grade_type), "
+            f"{prefix}_total = (SELECT COALESCE(SUM(percentage), 0) FROM grades "
+            f"WHERE grades.student_id = students.id AND grades.grade_type = :grade_type)"
+        ), {"grade_type": grade_type})
+
+def _v5_id_sequences(connection):
+    """Add the student ID sequence, starting after the highest existing ID."""
+    from .database import IdSequence
+    from ..services.id_allocator import STUDENT_SEQUENCE, highest_student_number
+
+    IdSequence.__table__.create(bind=connection, checkfirst=True)
+    ids = connection.execute(text("SELECT id FROM students")).scalars()
+    connection.execute(
+        IdSequence.__table__.insert().values(name=STUDENT_SEQUENCE, value=highest_student_number(ids))
+    )
+
+def _v6_data_versions(connection):
+    from .database import DataVersion
+
+    DataVersion.__table__.create(bind=connection, checkfirst=True)
+
+# (version, upgrade) pairs; each upgrade moves the schema from version - 1 to version
+MIGRATIONS = [
+    (2, _v2_indexes_and_foreign_keys),
+    (3, _v3_grades_table),
+    (4, _v4_running_aggregates),
+    (5, _v5_id_sequences),
+    (6, _v6_data_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def stamp_latest(engine):
+    """Record that the schema matches the current models (e.g. right after create_all)."""
+    with engine.begin() as connection:
+        set_schema_version(connection, LATEST_VERSION)
+
+def upgrade(engine):
+    """Apply pending migrations, each in its own transaction."""
+    with engine.begin() as connection:
+        current = get_schema_version(connection)
+    if current == 0:
+        logger.info("No existing schema to migrate")
+        return current
+
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Migrating schema to version {version} ({migration.__name__})")
+        with engine.connect() as connection:
+            is_sqlite = connection.dialect.name == "sqlite"
+            if is_sqlite:
+                # Table rebuilds must not trip foreign key checks halfway through;
+                # the pragma only takes effect outside a transaction
+                connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                connection.commit()
+            try:
+                with connection.begin():
+                    migration(connection)
+                    set_schema_version(connection, version)
+            finally:
+                if is_sqlite:
+                    connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                    connection.commit()
+        current = version
+    return current
+
+if __name__ == "__main__":
+    from .database import engine
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Schema is at version {upgrade(engine)}")
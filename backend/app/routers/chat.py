@@ -1,9 +1,21 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List, Dict
-from anthropic import Anthropic, APIError, APIConnectionError
-import os
+from typing import List, Dict, Deque, Optional
+from collections import deque
+from anthropic import APIError, APIConnectionError
 from dotenv import load_dotenv
+import asyncio
 import json
+import logging
+import os
+import uuid
+import zlib
+from ..services.anthropic_client import get_anthropic_client
+from ..services.response_cache import response_cache, make_cache_key
+from ..services.context_store import context_store, apply_patch
+from ..services.token_budget import count_tokens, fit_context_to_budget
+from ..services.llm_scheduler import llm_scheduler
+from ..services.session_store import SessionStore, create_session_store
+from ..schemas.chat import ChatStats
 
 
 #https://docs.anthropic.com/en/docs/about-claude/models#model-comparison-table
@@ -11,100 +23,312 @@ import json
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Bounds on the per-client conversation history sent with follow-up questions
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "10"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+
+# Stable instructions sent as the first (cacheable) system block
+SYSTEM_PROMPT = """You are an educational assistant helping teachers analyze student performance and provide insights. 
+Keep responses focused on academic context and student success. Be concise but informative.
+You have access to the current page content and structure to provide more contextual responses."""
+
 # Initialize router
 router = APIRouter()
 
-# Connection Manager for WebSocket clients
+# Connection Manager for WebSocket clients. Sockets are local to this process;
+# page context and history are mirrored to the session store so a reconnect
+# handled by another worker picks up where the client left off.
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, session_store: SessionStore = None):
+        self.session_store = session_store or create_session_store()
         self.active_connections: Dict[str, WebSocket] = {}
+        # Maps client_id to the hash of its page context in the shared context store
         self.page_contexts: Dict[str, str] = {}
+        # Ring buffer of recent {"role", "content"} turns per client
+        self.histories: Dict[str, Deque[dict]] = {}
 
     async def connect(self, client_id: str, websocket: WebSocket):
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        await self.restore_session(client_id)
 
     def disconnect(self, client_id: str):
+        # Only local state is dropped; the session store keeps it until it expires
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         if client_id in self.page_contexts:
-            del self.page_contexts[client_id]
+            context_store.release(self.page_contexts.pop(client_id))
+        self.histories.pop(client_id, None)
+
+    async def restore_session(self, client_id: str):
+        if client_id in self.page_contexts or client_id in self.histories:
+            return
+        state = await self.session_store.load(client_id)
+        if not state:
+            return
+        self.histories[client_id] = deque(state.get("history", []), maxlen=CHAT_HISTORY_MAX_TURNS * 2)
+        context_hash = state.get("context_hash")
+        if context_hash and await self._acquire_context(context_hash):
+            self.page_contexts[client_id] = context_hash
+
+    async def _persist(self, client_id: str):
+        await self.session_store.save(client_id, {
+            "context_hash": self.page_contexts.get(client_id),
+            "history": self.get_history(client_id)
+        })
 
-    def store_context(self, client_id: str, context: str):
-        self.page_contexts[client_id] = context
+    async def _acquire_context(self, context_hash: str) -> bool:
+        """Take a reference on a context, pulling it from the session store if needed."""
+        if context_store.acquire(context_hash):
+            return True
+        blob = await self.session_store.load_context(context_hash)
+        if blob is None:
+            return False
+        context_store.put_blob(context_hash, blob)
+        return True
+
+    def _set_context_hash(self, client_id: str, context_hash: str):
+        previous = self.page_contexts.get(client_id)
+        self.page_contexts[client_id] = context_hash
+        if previous is not None:
+            context_store.release(previous)
+
+    async def store_context(self, client_id: str, context: str) -> str:
+        context_hash = context_store.put(context)
+        self._set_context_hash(client_id, context_hash)
+        if context_store.refcounts[context_hash] == 1:
+            # First holder in this process; share the compressed page with other workers
+            await self.session_store.save_context(context_hash, context_store.get_blob(context_hash))
+        await self._persist(client_id)
+        return context_hash
+
+    async def use_stored_context(self, client_id: str, context_hash: str) -> bool:
+        """Point a client at a context already in the store; False if it is unknown."""
+        if self.page_contexts.get(client_id) == context_hash:
+            return True
+        if not await self._acquire_context(context_hash):
+            return False
+        self._set_context_hash(client_id, context_hash)
+        await self._persist(client_id)
+        return True
+
+    async def get_base_context(self, context_hash: str) -> str:
+        """Context text for a hash, from this process or the session store."""
+        context = context_store.get(context_hash)
+        if context is None:
+            blob = await self.session_store.load_context(context_hash)
+            if blob is not None:
+                context = zlib.decompress(blob).decode("utf-8")
+        return context
 
     def get_context(self, client_id: str) -> str:
-        return self.page_contexts.get(client_id, '')
+        context_hash = self.page_contexts.get(client_id)
+        if context_hash is None:
+            return ''
+        return context_store.get(context_hash) or ''
+
+    async def add_exchange(self, client_id: str, question: str, answer: str):
+        """Record a completed question/answer pair, keeping history within its turn and token caps."""
+        history = self.histories.setdefault(client_id, deque(maxlen=CHAT_HISTORY_MAX_TURNS * 2))
+        history.append({"role": "user", "content": question})
+        history.append({"role": "assistant", "content": answer})
+        while len(history) > 2 and sum(count_tokens(turn["content"]) for turn in history) > CHAT_HISTORY_TOKEN_BUDGET:
+            history.popleft()
+            history.popleft()
+        await self._persist(client_id)
+
+    def get_history(self, client_id: str) -> List[dict]:
+        return list(self.histories.get(client_id, ()))
 
-    async def send_message(self, message: str, client_id: str):
+    async def send_frame(self, frame: dict, client_id: str):
         if client_id in self.active_connections:
-            await self.active_connections[client_id].send_json({
-                "message": message,
-                "sender": "assistant"
-            })
+            await self.active_connections[client_id].send_json(frame)
+
+    async def send_message(self, message: str, client_id: str, message_type: str = "message", request_id: Optional[str] = None):
+        # message_type is "delta" for streamed chunks, "done" once a reply is
+        # complete and "message" for standalone frames such as errors
+        frame = {
+            "type": message_type,
+            "message": message,
+            "sender": "assistant"
+        }
+        if request_id is not None:
+            frame["request_id"] = request_id
+        await self.send_frame(frame, client_id)
 
 manager = ConnectionManager()
 
-# Initialize Anthropic client
-def get_anthropic_client():
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise Exception("ANTHROPIC_API_KEY not found in environment variables")
-    return Anthropic(api_key=api_key)
+@router.get("/chat/stats", response_model=ChatStats)
+async def get_chat_stats():
+    return {
+        "cache": response_cache.stats(),
+        "contexts": context_store.stats(),
+        "queue": llm_scheduler.stats(),
+    }
+
+async def answer_message(client, client_id: str, content: str, request_id: str):
+    """Answer one chat message, streaming frames tagged with its request_id."""
+    async def notify_queued(position: int):
+        await manager.send_frame({"type": "queued", "position": position, "request_id": request_id}, client_id)
+    
+    try:
+        # Get the stored context for this client
+        context = manager.get_context(client_id)
+        
+        history = manager.get_history(client_id)
+        
+        # Answer repeated opening questions about the same page from the cache.
+        # Follow-ups depend on the conversation so they always go upstream.
+        cache_key = make_cache_key(context, content) if not history else None
+        cached_response = response_cache.get(cache_key) if cache_key else None
+        if cached_response is not None:
+            await manager.add_exchange(client_id, content, cached_response)
+            await manager.send_message(cached_response, client_id, message_type="done", request_id=request_id)
+            return
+        
+        # Trim the page context to the token budget, keeping rows relevant to the question
+        context_tokens = count_tokens(context)
+        context = fit_context_to_budget(context, content)
+        logger.info(
+            f"Prompt context for {client_id}: {context_tokens} tokens before trimming, "
+            f"{count_tokens(context)} after"
+        )
+        
+        # The instructions and page context form a stable prefix that is marked
+        # cacheable, so follow-up turns on the same page reuse it upstream
+        system_blocks = [
+            {"type": "text", "text": SYSTEM_PROMPT},
+            {
+                "type": "text",
+                "text": f"Page Context: {context}",
+                "cache_control": {"type": "ephemeral"}
+            }
+        ]
+        
+        # Replay the bounded conversation history, caching up to its last turn
+        messages = [dict(turn) for turn in history]
+        if messages:
+            messages[-1]["content"] = [{
+                "type": "text",
+                "text": messages[-1]["content"],
+                "cache_control": {"type": "ephemeral"}
+            }]
+        messages.append({
+            "role": "user",
+            "content": content
+        })
+        
+        # Stream the response from Claude, forwarding each chunk as it arrives.
+        # The scheduler caps concurrent upstream calls and queues fairly per client.
+        # Cancelling this task closes the stream, which aborts the upstream request.
+        chunks = []
+        async with llm_scheduler.slot(client_id, notify_queued):
+            async with client.messages.stream(
+                model="claude-3-5-haiku-20241022",
+                max_tokens=1024,
+                system=system_blocks,
+                messages=messages
+            ) as stream:
+                async for text in stream.text_stream:
+                    chunks.append(text)
+                    await manager.send_message(text, client_id, message_type="delta", request_id=request_id)
+        
+        # Signal completion with the full response text
+        response_text = "".join(chunks)
+        if cache_key:
+            response_cache.set(cache_key, response_text)
+        await manager.add_exchange(client_id, content, response_text)
+        await manager.send_message(response_text, client_id, message_type="done", request_id=request_id)
+        
+    except APIError as e:
+        await manager.send_message(f"API Error: {str(e)}", client_id, request_id=request_id)
+    except APIConnectionError as e:
+        await manager.send_message(f"Connection Error: {str(e)}", client_id, request_id=request_id)
+    except Exception as e:
+        await manager.send_message(f"Error: {str(e)}", client_id, request_id=request_id)
 
 @router.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await manager.connect(client_id, websocket)
+    # Shared, connection-pooled client created once per process
     client = get_anthropic_client()
     
+    # In-flight answers for this socket, keyed by request_id
+    pending: Dict[str, asyncio.Task] = {}
+    
+    async def cancel_requests(request_id: Optional[str] = None):
+        request_ids = [request_id] if request_id is not None else list(pending)
+        for cancelled_id in request_ids:
+            task = pending.pop(cancelled_id, None)
+            if task is not None and not task.done():
+                task.cancel()
+                # Wait for the stream to close so the ack means upstream work has stopped
+                await asyncio.wait([task])
+                await manager.send_frame({"type": "cancelled", "request_id": cancelled_id}, client_id)
+    
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            parsed_data = json.loads(data)
             
             try:
+                parsed_data = json.loads(data)
                 if parsed_data["type"] == "context":
-                    # Store the page context for this client
-                    manager.store_context(client_id, parsed_data["content"])
+                    if "content" in parsed_data:
+                        # Store the full page context for this client
+                        context_hash = await manager.store_context(client_id, parsed_data["content"])
+                    elif await manager.use_stored_context(client_id, parsed_data["hash"]):
+                        # Context unchanged; reuse the stored copy
+                        context_hash = parsed_data["hash"]
+                    else:
+                        await manager.send_frame({"type": "context_missing", "hash": parsed_data["hash"]}, client_id)
+                        continue
+                    await manager.send_frame({"type": "context_ack", "hash": context_hash}, client_id)
                     continue
                 
-                # Get the stored context for this client
-                context = manager.get_context(client_id)
-                
-                # Create a message to Claude with context about being an educational assistant
-                system_prompt = """You are an educational assistant helping teachers analyze student performance and provide insights. 
-                Keep responses focused on academic context and student success. Be concise but informative.
-                You have access to the current page content and structure to provide more contextual responses."""
+                if parsed_data["type"] == "context_patch":
+                    # Apply a diff against a context the store already holds
+                    base = await manager.get_base_context(parsed_data["base_hash"])
+                    try:
+                        if base is None:
+                            raise ValueError("Unknown base context")
+                        patched = apply_patch(base, parsed_data["ops"])
+                    except (ValueError, KeyError, TypeError):
+                        await manager.send_frame({"type": "context_missing", "hash": parsed_data["base_hash"]}, client_id)
+                        continue
+                    context_hash = await manager.store_context(client_id, patched)
+                    await manager.send_frame({"type": "context_ack", "hash": context_hash}, client_id)
+                    continue
                 
-                # Construct the user message with context
-                user_message = f"""Page Context: {context}
-
-User Message: {parsed_data["content"]}
-
-Please provide a response that takes into account both the user's message and the current page context."""
+                if parsed_data["type"] == "cancel":
+                    # Abort one pending request, or all of them if no request_id is given
+                    await cancel_requests(parsed_data.get("request_id"))
+                    continue
                 
-                # Send message to Claude
-                response = client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=1024,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": user_message
-                    }]
+                # A new question supersedes any pending one unless the client asks
+                # for it to run in parallel; answers are tagged by request_id
+                request_id = str(parsed_data.get("request_id") or uuid.uuid4().hex)
+                if not parsed_data.get("parallel"):
+                    await cancel_requests()
+                elif request_id in pending:
+                    await cancel_requests(request_id)
+                task = asyncio.create_task(answer_message(client, client_id, parsed_data["content"], request_id))
+                pending[request_id] = task
+                task.add_done_callback(
+                    lambda done, request_id=request_id: pending.pop(request_id, None) if pending.get(request_id) is done else None
                 )
                 
-                # Extract the response text and send back to client
-                response_text = response.content[0].text
-                await manager.send_message(response_text, client_id)
-                
-            except APIError as e:
-                await manager.send_message(f"API Error: {str(e)}", client_id)
-            except APIConnectionError as e:
-                await manager.send_message(f"Connection Error: {str(e)}", client_id)
             except Exception as e:
                 await manager.send_message(f"Error: {str(e)}", client_id)
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # However the socket ended, stop paying for answers nobody will receive
+        tasks = list(pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         manager.disconnect(client_id)
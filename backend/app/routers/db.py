@@ -1,93 +1,389 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List, Dict
-import json
-from ..schemas.student import Student, StudentCreate, Grade, Section, SectionResponse, Class, ClassResponse
-from ..models.database import Student as DBStudent, Section as DBSection, Class as DBClass, get_db
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, undefer
+from typing import Iterable, List, Dict, Optional, Literal
+from collections import defaultdict
+from pydantic import ValidationError
+import asyncio
+import hashlib
+import logging
+from ..schemas.stats import ClassStats, SchoolStats, LookupCacheStats
+from ..schemas.student import (
+    Student, StudentCreate, StudentSummary, Grade, GradeImport, Section, SectionResponse, Class, ClassResponse, ImportReport
+)
+from ..models.database import (
+    Student as DBStudent, Section as DBSection, Grade as DBGrade, STUDENT_JSON_COLUMNS, get_async_db
+)
+from ..services.rank_engine import rank_engine, NEW_STUDENT_RANK
+from ..services.aggregates import grade_summary, load_ranks
+from ..services.id_allocator import allocate_student_ids
+from ..services.bulk_import import iter_chunks, detect_format, format_validation_error
+from ..services.export import stream_rows, MEDIA_TYPES
+from ..services.fast_json import DefaultJSONResponse
+from ..services.analytics import class_stats, school_stats, stats_cache, invalidate_class_stats
+from ..services.lookup_cache import catalog_cache, student_cache
+from ..services.versions import (
+    CATALOG_VERSION, CLASS_VERSION_PREFIX, class_version, bump_versions, get_version, get_class_versions,
+    get_all_classes_version
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/db",
     tags=["database"]
 )
 
+# Full student queries load grades eagerly, since academic_performance is built
+# from them, and undefer the JSON columns
+def select_students():
+    return select(DBStudent).options(selectinload(DBStudent.grades), *(undefer(column) for column in STUDENT_JSON_COLUMNS))
+
+_rank_engine_lock = asyncio.Lock()
+
+async def ensure_rank_engine(db: AsyncSession):
+    """Load every ranked student's GPA into the rank engine on first use, and
+    reload the classes other workers have written to since."""
+    versions = await get_class_versions(db)
+    if rank_engine.loaded and not rank_engine.stale_classes(versions):
+        return
+    async with _rank_engine_lock:
+        if not rank_engine.loaded:
+            await load_ranks(db, rank_engine)
+        else:
+            stale = rank_engine.stale_classes(versions)
+            if not stale:
+                return
+            await load_ranks(db, rank_engine, stale)
+        rank_engine.versions = versions
+
+def rank_committed(students: Iterable[DBStudent], versions: Dict[str, int]):
+    """Move committed GPAs into the rank engine and advance it past the write.
+
+    versions are the class versions returned by the write's bump_versions.
+    """
+    for student in students:
+        if student.test_count:
+            rank_engine.update(student.id, student.class_id, student.grade, student.gpa)
+    for name, version in versions.items():
+        if name.startswith(CLASS_VERSION_PREFIX):
+            rank_engine.advance(name[len(CLASS_VERSION_PREFIX):], version)
+
+# Plain columns can be projected straight from the students table; the JSON
+# fields are only loaded when a fields= projection names them
+STUDENT_COLUMN_FIELDS = [
+    "id", "name", "grade", "class_id", "section", "gpa", "attendance_percentage",
+    "attendance_days", "homework_points", "homework_completed"
+]
+STUDENT_JSON_FIELDS = ["academic_performance", "ai_insights"]
+STUDENT_SUMMARY_FIELDS = ["id", "name", "grade", "class_id", "section", "gpa", "attendance_percentage"]
+MAX_PAGE_SIZE = 1000
+
+class StudentListQuery:
+    """Keyset pagination, filters and field projection shared by the student listings."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="Return students with ids after this one"),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; all students if omitted"),
+        section: Optional[str] = None,
+        grade: Optional[int] = None,
+        min_gpa: Optional[float] = None,
+        max_gpa: Optional[float] = None,
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return; id is always included"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.section = section
+        self.grade = grade
+        self.min_gpa = min_gpa
+        self.max_gpa = max_gpa
+        self.fields = None
+        if fields is not None:
+            requested = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in requested if field not in STUDENT_COLUMN_FIELDS + STUDENT_JSON_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+            self.fields = ["id"] + [field for field in requested if field != "id"]
+
+    def apply_filters(self, query, class_id: Optional[str] = None):
+        if class_id is not None:
+            query = query.where(DBStudent.class_id == class_id)
+        if self.section is not None:
+            query = query.where(DBStudent.section == self.section)
+        if self.grade is not None:
+            query = query.where(DBStudent.grade == self.grade)
+        if self.min_gpa is not None:
+            query = query.where(DBStudent.gpa >= self.min_gpa)
+        if self.max_gpa is not None:
+            query = query.where(DBStudent.gpa <= self.max_gpa)
+        if self.cursor is not None:
+            query = query.where(DBStudent.id > self.cursor)
+        query = query.order_by(DBStudent.id)
+        if self.limit is not None:
+            # One extra row tells us whether there is a next page
+            query = query.limit(self.limit + 1)
+        return query
+
+async def list_students(db: AsyncSession, params: StudentListQuery, response: Response, class_id: Optional[str] = None):
+    """Run a student listing; the next page's cursor is returned in the X-Next-Cursor header."""
+    if params.fields is None or "academic_performance" in params.fields:
+        await ensure_rank_engine(db)
+        rows = (await db.execute(params.apply_filters(select_students(), class_id))).scalars().all()
+    else:
+        # Column projection skips the JSON blobs and the grades load entirely
+        columns = [getattr(DBStudent, field) for field in params.fields]
+        rows = (await db.execute(params.apply_filters(select(*columns), class_id))).all()
+
+    if params.limit is not None and len(rows) > params.limit:
+        rows = rows[:params.limit]
+        response.headers["X-Next-Cursor"] = rows[-1].id
+
+    fields = params.fields or STUDENT_COLUMN_FIELDS + STUDENT_JSON_FIELDS
+    content = [{field: getattr(row, field) for field in fields} for row in rows]
+    if "academic_performance" in fields:
+        content = [with_live_rank(data) for data in content]
+    return trusted_response(content, response)
+
+def with_live_rank(data: dict) -> dict:
+    """Swap the stored rank snapshot for the student's current rank in the cohort.
+
+    Ranks move with the rest of the cohort, so they're never served from
+    the stored column or a cache when the rank engine knows the student.
+    """
+    rank = rank_engine.rank(data["id"])
+    if rank is None:
+        return data
+    return {**data, "academic_performance": {**data["academic_performance"], "rank": rank}}
+
+def trusted_response(content, response: Response) -> Response:
+    """Encode rows read from our own tables straight to JSON.
+
+    They already match the response models, so this skips Pydantic
+    validation and jsonable_encoder, which dominate large listings.
+    """
+    headers = {name: response.headers[name] for name in ("ETag", "X-Next-Cursor") if name in response.headers}
+    return DefaultJSONResponse(content=content, headers=headers)
+
+def check_etag(request: Request, response: Response, version: int) -> Optional[Response]:
+    """Tag a read with its data version; a 304 response if the client already has it.
+
+    The query string is part of the tag since filters and projections
+    change the payload for the same data version.
+    """
+    query = hashlib.sha256(str(sorted(request.query_params.multi_items())).encode("utf-8")).hexdigest()[:16]
+    etag = f'W/"{version}-{query}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+def student_data(student: DBStudent) -> dict:
+    return {field: getattr(student, field) for field in STUDENT_COLUMN_FIELDS + STUDENT_JSON_FIELDS}
+
+async def load_student(db: AsyncSession, student_id: str, populate_existing: bool = False):
+    query = select_students().where(DBStudent.id == student_id)
+    if populate_existing:
+        query = query.execution_options(populate_existing=True)
+    return (await db.execute(query)).scalars().first()
+
 @router.get("/classes", response_model=ClassResponse)
-async def get_classes(db: Session = Depends(get_db)):
-    db_classes = db.query(DBClass).all()
-    # Transform database objects into the expected schema format
-    classes = [{"id": cls.id, "name": cls.name} for cls in db_classes]
-    return {"classes": classes}
+async def get_classes(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    version = await get_version(db, CATALOG_VERSION)
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    return {"classes": await catalog_cache.get_classes(db, version)}
+
+@router.get("/classes/{class_id}/stats", response_model=ClassStats)
+async def get_class_stats(class_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    version = await get_version(db, class_version(class_id))
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    stats = await class_stats(db, class_id, version)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+    return stats
+
+@router.get("/stats", response_model=SchoolStats)
+async def get_school_stats(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    version = await get_all_classes_version(db)
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    return await school_stats(db, version)
+
+@router.get("/cache/stats", response_model=LookupCacheStats)
+async def get_cache_stats():
+    return {
+        "catalog": catalog_cache.stats(),
+        "students": student_cache.stats(),
+        "analytics": stats_cache.stats(),
+    }
 
 @router.get("/classes/{class_id}/sections", response_model=SectionResponse)
-async def get_sections_by_class(class_id: str, db: Session = Depends(get_db)):
-    sections = db.query(DBSection).filter(DBSection.class_id == class_id).all()
-    return {"sections": [{"name": section.name, "class_id": section.class_id} for section in sections]}
+async def get_sections_by_class(class_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    version = await get_version(db, CATALOG_VERSION)
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    sections = await catalog_cache.get_sections(db, class_id, version)
+    return {"sections": [{"name": name, "class_id": class_id} for name in sections]}
 
 @router.post("/sections")
-async def create_section(section: Section, db: Session = Depends(get_db)):
+async def create_section(section: Section, db: AsyncSession = Depends(get_async_db)):
     # Check if class exists
-    class_exists = db.query(DBClass).filter(DBClass.id == section.class_id).first()
-    if not class_exists:
+    if not await catalog_cache.has_class(db, section.class_id):
         raise HTTPException(status_code=400, detail="Class does not exist")
     
     # Check if section already exists for this class
-    existing = db.query(DBSection).filter(
-        DBSection.name == section.name,
-        DBSection.class_id == section.class_id
-    ).first()
-    if existing:
+    if await catalog_cache.has_section(db, section.class_id, section.name):
         raise HTTPException(status_code=400, detail="Section already exists for this class")
     
     db_section = DBSection(name=section.name, class_id=section.class_id)
     db.add(db_section)
-    db.commit()
+    await bump_versions(db, [CATALOG_VERSION])
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Created concurrently by another request
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Section already exists for this class")
+    finally:
+        catalog_cache.invalidate()
     return {"message": "Section created successfully"}
 
 @router.get("/students", response_model=List[Student])
-async def get_students(db: Session = Depends(get_db)):
-    students = db.query(DBStudent).all()
-    return students
+async def get_students(
+    request: Request,
+    response: Response,
+    class_id: Optional[str] = None,
+    params: StudentListQuery = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if class_id is not None:
+        version = await get_version(db, class_version(class_id))
+    else:
+        version = await get_all_classes_version(db)
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    return await list_students(db, params, response, class_id)
+
+def summary_fields(params: StudentListQuery):
+    """Default a summary listing to the summary fields and refuse any others, the JSON ones included."""
+    if params.fields is None:
+        params.fields = STUDENT_SUMMARY_FIELDS
+        return
+    unknown = [field for field in params.fields if field not in STUDENT_SUMMARY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+@router.get("/students/summary", response_model=List[StudentSummary])
+async def get_student_summaries(
+    request: Request,
+    response: Response,
+    class_id: Optional[str] = None,
+    params: StudentListQuery = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lightweight student listing; same options as /students, limited to the summary fields."""
+    summary_fields(params)
+    return await get_students(request, response, class_id, params, db)
+
+# Exports use the import column names so a file can be loaded back as-is
+STUDENT_EXPORT_FIELDS = STUDENT_COLUMN_FIELDS + ["ai_insights"]
+GRADE_EXPORT_COLUMNS = {
+    "student_id": DBGrade.student_id,
+    "testName": DBGrade.name,
+    "score": DBGrade.score,
+    "totalPoints": DBGrade.total_points,
+    "percentage": DBGrade.percentage,
+    "date": DBGrade.date,
+    "gradeType": DBGrade.grade_type,
+}
+
+def export_response(db: AsyncSession, query, fields: List[str], format: str, name: str) -> StreamingResponse:
+    extension = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_rows(db.bind, query, fields, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+@router.get("/students/export")
+async def export_students(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    class_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream all students (optionally one class) as NDJSON or CSV."""
+    query = select(*(getattr(DBStudent, field) for field in STUDENT_EXPORT_FIELDS)).order_by(DBStudent.id)
+    if class_id is not None:
+        query = query.where(DBStudent.class_id == class_id)
+    return export_response(db, query, STUDENT_EXPORT_FIELDS, format, "students")
+
+@router.get("/grades/export")
+async def export_grades(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    class_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream all grades (optionally one class) as NDJSON or CSV."""
+    query = select(*GRADE_EXPORT_COLUMNS.values()).order_by(DBGrade.student_id, DBGrade.id)
+    if class_id is not None:
+        query = query.join(DBStudent, DBStudent.id == DBGrade.student_id).where(DBStudent.class_id == class_id)
+    return export_response(db, query, list(GRADE_EXPORT_COLUMNS), format, "grades")
 
 @router.get("/students/{student_id}", response_model=Student)
-async def get_student(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(DBStudent).filter(DBStudent.id == student_id).first()
-    if student is None:
-        raise HTTPException(status_code=404, detail="Student not found")
-    return student
+async def get_student(student_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    # Ranks depend on classmates, so any class's version covers this student
+    version = await get_all_classes_version(db)
+    not_modified = check_etag(request, response, version)
+    if not_modified:
+        return not_modified
+    await ensure_rank_engine(db)
+    data = student_cache.get(student_id, version)
+    if data is None:
+        student = await load_student(db, student_id)
+        if student is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        data = student_data(student)
+        student_cache.set(student_id, data, version)
+    return trusted_response(with_live_rank(data), response)
 
 @router.get("/classes/{class_id}/students", response_model=List[Student])
-async def get_students_by_class(class_id: str, db: Session = Depends(get_db)):
-    students = db.query(DBStudent).filter(DBStudent.class_id == class_id).all()
-    return students
+async def get_students_by_class(
+    class_id: str,
+    request: Request,
+    response: Response,
+    params: StudentListQuery = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    not_modified = check_etag(request, response, await get_version(db, class_version(class_id)))
+    if not_modified:
+        return not_modified
+    return await list_students(db, params, response, class_id)
 
-@router.post("/students", response_model=Student)
-async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
-    # Validate class exists
-    class_exists = db.query(DBClass).filter(DBClass.id == student.class_id).first()
-    if not class_exists:
-        raise HTTPException(status_code=400, detail="Invalid class")
+@router.get("/classes/{class_id}/roster", response_model=List[StudentSummary])
+async def get_class_roster(
+    class_id: str,
+    request: Request,
+    response: Response,
+    params: StudentListQuery = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    summary_fields(params)
+    return await get_students_by_class(class_id, request, response, params, db)
 
-    # Validate section exists for the class
-    section_exists = db.query(DBSection).filter(
-        DBSection.name == student.section,
-        DBSection.class_id == student.class_id
-    ).first()
-    if not section_exists:
-        raise HTTPException(status_code=400, detail="Invalid section for this class")
-    
-    # Generate new student ID
-    student_count = db.query(DBStudent).count()
-    new_id = f"ST{student_count + 1:04d}"
-    
-    # Initialize academic performance
-    initial_academic_performance = {
-        "rank": "New Student",
-        "tests": {},
-        "homework": {}
-    }
-    
-    # Create new student with initialized fields
-    db_student = DBStudent(
-        id=new_id,
+def new_student(student_id: str, student: StudentCreate) -> DBStudent:
+    """A new student with initialized fields; scores are added through the grades table."""
+    return DBStudent(
+        id=student_id,
         name=student.name,
         grade=student.grade,
         class_id=student.class_id,
@@ -97,75 +393,235 @@ async def create_student(student: StudentCreate, db: Session = Depends(get_db)):
         attendance_days="0/0",
         homework_points=0,
         homework_completed="0/0",
-        academic_performance=initial_academic_performance,
-        ai_insights={"status": "Pending", "recommendation": "Initial assessment needed"}
+        academic_performance={"rank": NEW_STUDENT_RANK},
+        ai_insights={"status": "Pending", "recommendation": "Initial assessment needed"},
+        grades=[]
     )
+
+@router.post("/students", response_model=Student)
+async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_async_db)):
+    # Validate class exists
+    if not await catalog_cache.has_class(db, student.class_id):
+        raise HTTPException(status_code=400, detail="Invalid class")
+
+    # Validate section exists for the class
+    if not await catalog_cache.has_section(db, student.class_id, student.section):
+        raise HTTPException(status_code=400, detail="Invalid section for this class")
+    
+    # Allocate a new student ID
+    new_id, = await allocate_student_ids(db)
     
+    db_student = new_student(new_id, student)
     db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
+    versions = await bump_versions(db, [class_version(student.class_id)])
+    await db.commit()
+    # New students have no tests, so the ranks already reflect this write
+    rank_committed([], versions)
+    invalidate_class_stats(db_student.class_id)
     return db_student
 
+def apply_aggregate_delta(student: DBStudent, grade_type: str, count_delta: int, total_delta: int):
+    """Adjust the running test/homework aggregates. Increments run in SQL so
+    concurrent writes for the same student don't lose updates."""
+    count_column = f"{grade_type}_count"
+    total_column = f"{grade_type}_total"
+    setattr(student, count_column, getattr(DBStudent, count_column) + count_delta)
+    setattr(student, total_column, getattr(DBStudent, total_column) + total_delta)
+
+def update_grade_summary(student: DBStudent, grade_type: str):
+    """Recompute GPA and rank, or homework totals, from freshly refreshed aggregates.
+
+    Callers load the rank engine first (ensure_rank_engine).
+    """
+    count = getattr(student, f"{grade_type}_count")
+    for name, value in grade_summary(grade_type, count, getattr(student, f"{grade_type}_total")).items():
+        setattr(student, name, value)
+    if grade_type == "test" and count:
+        # Rank against the student's cohort; the stored rank is a snapshot
+        # for readers that don't consult the rank engine. The engine itself
+        # only takes the new GPA once it is committed (see rank_committed).
+        student.academic_performance = {
+            **(student._academic_performance or {}),
+            "rank": rank_engine.rank_with(student.id, student.class_id, student.grade, student.gpa)
+        }
+
+async def find_grade(db: AsyncSession, student_id: str, grade_type: str, name: str) -> Optional[DBGrade]:
+    return (await db.execute(select(DBGrade).where(
+        DBGrade.student_id == student_id,
+        DBGrade.grade_type == grade_type,
+        DBGrade.name == name
+    ))).scalars().first()
+
 @router.post("/students/{student_id}/grades", response_model=Student)
-async def add_grade(student_id: str, grade: Grade, db: Session = Depends(get_db)):
-    student = db.query(DBStudent).filter(DBStudent.id == student_id).first()
+async def add_grade(student_id: str, grade: Grade, db: AsyncSession = Depends(get_async_db)):
+    # The summary JSON gets the new rank; ai_insights stays unloaded
+    student = await db.get(DBStudent, student_id, options=[undefer(DBStudent._academic_performance)])
     if student is None:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Calculate percentage score
     percentage = round((grade.score / grade.totalPoints) * 100)
     
-    # Get current academic performance or initialize if None
-    academic_performance = student.academic_performance
-    if academic_performance is None:
-        academic_performance = {"rank": "New Student", "tests": {}, "homework": {}}
-    elif isinstance(academic_performance, str):
-        academic_performance = json.loads(academic_performance)
+    # Bump the version first: pysqlite only sends BEGIN before a write, so this
+    # UPDATE opens the transaction that the grade savepoint below nests inside.
+    # Otherwise the savepoint's RELEASE would commit the grade on its own.
+    versions = await bump_versions(db, [class_version(student.class_id)])
     
-    # Ensure both dictionaries exist
-    if "tests" not in academic_performance:
-        academic_performance["tests"] = {}
-    if "homework" not in academic_performance:
-        academic_performance["homework"] = {}
+    # Insert the grade, or replace an earlier one with the same name. The
+    # earlier value turns the change into a delta on the running aggregates.
+    values = {"score": grade.score, "total_points": grade.totalPoints, "percentage": percentage, "date": grade.date}
+    db_grade = await find_grade(db, student_id, grade.gradeType, grade.testName)
+    if db_grade is None:
+        try:
+            async with db.begin_nested():
+                db.add(DBGrade(student_id=student_id, grade_type=grade.gradeType, name=grade.testName, **values))
+            count_delta, total_delta = 1, percentage
+        except IntegrityError:
+            # Inserted concurrently by another request; replace that one instead
+            db_grade = await find_grade(db, student_id, grade.gradeType, grade.testName)
+    if db_grade is not None:
+        count_delta, total_delta = 0, percentage - db_grade.percentage
+        for name, value in values.items():
+            setattr(db_grade, name, value)
     
-    # Update appropriate category based on grade type
-    if grade.gradeType == "test":
-        academic_performance["tests"][grade.testName] = f"{percentage}%"
-        # Calculate GPA from tests only
-        test_scores = [
-            int(score.rstrip('%')) 
-            for score in academic_performance["tests"].values()
-        ]
-        if test_scores:
-            avg_score = sum(test_scores) / len(test_scores)
-            new_gpa = round(avg_score / 25, 1)  # Convert percentage to 4.0 scale
-            student.gpa = new_gpa
-            
-            # Update rank based on new GPA
-            if new_gpa >= 3.7:
-                academic_performance["rank"] = "Top 5%"
-            elif new_gpa >= 3.3:
-                academic_performance["rank"] = "Top 10%"
-            elif new_gpa >= 3.0:
-                academic_performance["rank"] = "Top 25%"
-            else:
-                academic_performance["rank"] = "Average"
-    else:  # homework
-        academic_performance["homework"][grade.testName] = f"{percentage}%"
-        # Update homework points and completed count
-        homework_scores = [
-            int(score.rstrip('%')) 
-            for score in academic_performance["homework"].values()
-        ]
-        student.homework_points = sum(homework_scores)
-        student.homework_completed = f"{len(homework_scores)}/{len(homework_scores)}"
+    apply_aggregate_delta(student, grade.gradeType, count_delta, total_delta)
+    await db.flush()
+    await db.refresh(student, attribute_names=[f"{grade.gradeType}_count", f"{grade.gradeType}_total"])
+    await ensure_rank_engine(db)
+    update_grade_summary(student, grade.gradeType)
     
-    # Update student record
-    student.academic_performance = academic_performance
+    await db.commit()
+    rank_committed([student], versions)
+    invalidate_class_stats(student.class_id)
+    student_cache.delete(student_id)
     
-    # Explicitly mark as modified
-    db.add(student)
-    db.commit()
-    db.refresh(student)
-    
-    return student
+    # Reload with grades so the response carries the full tests/homework maps
+    return with_live_rank(student_data(await load_student(db, student_id, populate_existing=True)))
+
+def import_format(request: Request, format: Optional[Literal["csv", "jsonl"]] = None) -> str:
+    """Body format from ?format= or the Content-Type header."""
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=csv|jsonl")
+    return fmt
+
+async def commit_chunk(db: AsyncSession, report: dict, rows: List[int]) -> bool:
+    """Commit one chunk; if it fails, the whole chunk is reported as failed."""
+    try:
+        await db.commit()
+        report["imported"] += len(rows)
+        return True
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Bulk import chunk failed: {str(e)}")
+        report["errors"].extend({"row": row, "error": "Chunk failed to save"} for row in rows)
+        return False
+
+@router.post("/students/import", response_model=ImportReport)
+async def import_students(request: Request, fmt: str = Depends(import_format), db: AsyncSession = Depends(get_async_db)):
+    """Create students from CSV or JSON Lines (name, grade, class_id, section), one transaction per chunk."""
+    valid_sections = await catalog_cache.valid_sections(db)
+    report = {"imported": 0, "errors": []}
+
+    async for chunk in iter_chunks(request.stream(), fmt):
+        valid, rows = [], []
+        for row, record, error in chunk:
+            if error is None:
+                try:
+                    student = StudentCreate(**record)
+                    if (student.class_id, student.section) not in valid_sections:
+                        error = "Invalid class or section"
+                except ValidationError as e:
+                    error = format_validation_error(e)
+            if error is not None:
+                report["errors"].append({"row": row, "error": error})
+                continue
+            valid.append(student)
+            rows.append(row)
+        if valid:
+            # One sequence bump reserves IDs for the whole chunk
+            new_ids = await allocate_student_ids(db, len(valid))
+            db.add_all(new_student(new_id, student) for new_id, student in zip(new_ids, valid))
+            versions = await bump_versions(db, (class_version(student.class_id) for student in valid))
+            if await commit_chunk(db, report, rows):
+                rank_committed([], versions)
+            for class_id in {student.class_id for student in valid}:
+                invalidate_class_stats(class_id)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    return {**report, "failed": len(report["errors"])}
+
+@router.post("/grades/import", response_model=ImportReport)
+async def import_grades(request: Request, fmt: str = Depends(import_format), db: AsyncSession = Depends(get_async_db)):
+    """Add or replace grades from CSV or JSON Lines (student_id plus the grade fields), one transaction per chunk."""
+    report = {"imported": 0, "errors": []}
+
+    async for chunk in iter_chunks(request.stream(), fmt):
+        parsed = []
+        for row, record, error in chunk:
+            if error is None:
+                try:
+                    parsed.append((row, GradeImport(**record)))
+                    continue
+                except ValidationError as e:
+                    error = format_validation_error(e)
+            report["errors"].append({"row": row, "error": error})
+
+        # Prefetch the chunk's students and their existing grades in two queries
+        student_ids = {grade.student_id for _, grade in parsed}
+        students = {student.id: student for student in (await db.execute(
+            select(DBStudent).where(DBStudent.id.in_(student_ids)).options(undefer(DBStudent._academic_performance))
+        )).scalars()}
+        existing = {(g.student_id, g.grade_type, g.name): g for g in (await db.execute(
+            select(DBGrade).where(DBGrade.student_id.in_(student_ids))
+        )).scalars()}
+
+        deltas = defaultdict(lambda: [0, 0])
+        rows = []
+        for row, grade in parsed:
+            if grade.student_id not in students:
+                report["errors"].append({"row": row, "error": "Student not found"})
+                continue
+            percentage = round((grade.score / grade.totalPoints) * 100)
+            key = (grade.student_id, grade.gradeType, grade.testName)
+            delta = deltas[(grade.student_id, grade.gradeType)]
+            db_grade = existing.get(key)
+            if db_grade is None:
+                db_grade = existing[key] = DBGrade(
+                    student_id=grade.student_id, grade_type=grade.gradeType, name=grade.testName
+                )
+                db.add(db_grade)
+                delta[0] += 1
+                delta[1] += percentage
+            else:
+                delta[1] += percentage - db_grade.percentage
+            db_grade.score = grade.score
+            db_grade.total_points = grade.totalPoints
+            db_grade.percentage = percentage
+            db_grade.date = grade.date
+            rows.append(row)
+        if not rows:
+            continue
+
+        for (student_id, grade_type), (count_delta, total_delta) in deltas.items():
+            apply_aggregate_delta(students[student_id], grade_type, count_delta, total_delta)
+        await db.flush()
+        # Reload the incremented aggregates for the whole chunk at once
+        await db.execute(
+            select(DBStudent).where(DBStudent.id.in_({student_id for student_id, _ in deltas}))
+            .options(undefer(DBStudent._academic_performance))
+            .execution_options(populate_existing=True)
+        )
+        await ensure_rank_engine(db)
+        for student_id, grade_type in deltas:
+            update_grade_summary(students[student_id], grade_type)
+        versions = await bump_versions(db, (class_version(students[student_id].class_id) for student_id, _ in deltas))
+        if await commit_chunk(db, report, rows):
+            rank_committed((students[student_id] for student_id, grade_type in deltas if grade_type == "test"), versions)
+        for class_id in {students[student_id].class_id for student_id, _ in deltas}:
+            invalidate_class_stats(class_id)
+        for student_id, _ in deltas:
+            student_cache.delete(student_id)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    return {**report, "failed": len(report["errors"])}
@@ -12,3 +12,32 @@ class ChatMessage(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     context: Optional[str]
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    max_entries: int
+    ttl_seconds: float
+
+class ContextStats(BaseModel):
+    entries: int
+    references: int
+    raw_bytes: int
+    stored_bytes: int
+
+class QueueStats(BaseModel):
+    max_concurrent: int
+    active: int
+    depth: int
+    max_depth: int
+    granted: int
+    queued: int
+    avg_wait_seconds: float
+    max_wait_seconds: float
+
+class ChatStats(BaseModel):
+    cache: CacheStats
+    contexts: ContextStats
+    queue: QueueStats
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class GroupStats(BaseModel):
+    student_count: int
+    average_gpa: Optional[float]  # Over students with at least one test
+    average_attendance: Optional[float]
+    at_risk_count: int
+
+class SectionStats(GroupStats):
+    section: str
+
+class ClassSummary(GroupStats):
+    class_id: str
+    name: str
+
+class OverallStats(GroupStats):
+    min_gpa: Optional[float]
+    max_gpa: Optional[float]
+    attendance_distribution: Dict[str, int]
+    homework_average: Optional[float]  # Mean homework percentage from the grades table
+    # Completed / assigned across homework_completed, skipping values derived from graded homework
+    homework_completion_rate: Optional[float]
+
+class ClassStats(OverallStats):
+    class_id: str
+    name: str
+    sections: List[SectionStats]
+
+class SchoolStats(OverallStats):
+    classes: List[ClassSummary]
+
+class CacheCounters(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+
+class LookupCacheStats(BaseModel):
+    catalog: CacheCounters
+    students: CacheCounters
+    analytics: CacheCounters
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Optional, Literal, List
 
 class StudentBase(BaseModel):
@@ -23,10 +23,17 @@ class Student(StudentBase):
     class Config:
         orm_mode = True
 
+class StudentSummary(StudentBase):
+    """Roster row without the JSON fields."""
+    id: str
+    gpa: float
+    attendance_percentage: float
+
 class Grade(BaseModel):
     testName: str
     score: int
-    totalPoints: int
+    # The percentage is score / totalPoints
+    totalPoints: int = Field(..., gt=0)
     date: str
     gradeType: Literal["homework", "test"]
 
@@ -43,3 +50,17 @@ class Section(BaseModel):
 
 class SectionResponse(BaseModel):
     sections: List[Dict[str, str]]  # List of {name: str, class_id: str}
+
+class GradeImport(Grade):
+    student_id: str
+    # Sample grades have no date, and exports leave it empty
+    date: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
@@ -0,0 +1,112 @@
+from typing import Iterable, Optional
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import logging
+import os
+from ..models.database import Student, Grade, AsyncSessionLocal
+from .rank_engine import RankEngine, NEW_STUDENT_RANK
+from .versions import class_version, bump_versions
+
+logger = logging.getLogger(__name__)
+
+# How often the background checker compares running aggregates with the grades table (0 disables)
+AGGREGATE_CHECK_INTERVAL_SECONDS = float(os.getenv("AGGREGATE_CHECK_INTERVAL_SECONDS", "900"))
+
+_checker_task: Optional[asyncio.Task] = None
+
+def grade_summary(grade_type: str, count: int, total: int) -> dict:
+    """Student fields derived from one grade type's running aggregates."""
+    if grade_type == "test":
+        # Average test percentage on a 4.0 scale; no tests means no GPA yet
+        return {"gpa": round(total / count / 25, 1) if count else 0.0}
+    return {"homework_points": total, "homework_completed": f"{count}/{count}"}
+
+async def load_ranks(db: AsyncSession, engine: RankEngine, class_ids: Optional[Iterable[str]] = None):
+    """Fill a rank engine with every student who has at least one test, or reload only some classes."""
+    query = select(Student.id, Student.class_id, Student.grade, Student.gpa).where(Student.test_count > 0)
+    if class_ids is not None:
+        class_ids = set(class_ids)
+        query = query.where(Student.class_id.in_(class_ids))
+    engine.load((await db.execute(query)).all(), class_ids)
+
+def _grade_sums(grade_type: str):
+    """Count and percentage total of a student's grades of one type, correlated to the students row."""
+    match = (Grade.student_id == Student.id, Grade.grade_type == grade_type)
+    count = select(func.count()).where(*match).scalar_subquery()
+    total = select(func.coalesce(func.sum(Grade.percentage), 0)).where(*match).scalar_subquery()
+    return count, total
+
+async def rebuild_drifted_aggregates(db: AsyncSession) -> int:
+    """Recompute per-student grade counters from the grades table and fix any that drifted.
+
+    The GPA, homework fields and stored rank of repaired students are derived
+    again from the corrected counters. Returns the number of students repaired.
+    """
+    # Comparing and rewriting the counters in one statement means a grade write
+    # can't commit between reading the grades and overwriting a student, and the
+    # repaired rows stay locked for the follow-up updates until the commit
+    expected_tests = _grade_sums("test")
+    expected_homework = _grade_sums("homework")
+    counters = {
+        "test_count": expected_tests[0],
+        "test_total": expected_tests[1],
+        "homework_count": expected_homework[0],
+        "homework_total": expected_homework[1],
+    }
+    repaired = await db.execute(
+        update(Student)
+        .where(or_(*(getattr(Student, name) != expected for name, expected in counters.items())))
+        .values(**counters)
+        .returning(Student.id, Student.class_id, *(getattr(Student, name) for name in counters))
+        .execution_options(synchronize_session=False)
+    )
+    fixed_classes = set()
+    fixed = {}
+    for student_id, class_id, test_count, test_total, homework_count, homework_total in repaired.all():
+        values = {**grade_summary("test", test_count, test_total), **grade_summary("homework", homework_count, homework_total)}
+        await db.execute(update(Student).where(Student.id == student_id).values(**values))
+        fixed_classes.add(class_id)
+        fixed[student_id] = test_count
+
+    if fixed:
+        # Stored ranks are snapshots; rank the repaired students against the corrected GPAs
+        ranks = RankEngine()
+        await load_ranks(db, ranks)
+        performances = await db.execute(
+            select(Student.id, Student._academic_performance).where(Student.id.in_(fixed))
+        )
+        for student_id, performance in performances.all():
+            rank = ranks.rank(student_id) if fixed[student_id] else NEW_STUDENT_RANK
+            await db.execute(
+                update(Student).where(Student.id == student_id)
+                .values({Student._academic_performance: {**(performance or {}), "rank": rank}})
+            )
+
+    await bump_versions(db, (class_version(class_id) for class_id in fixed_classes))
+    await db.commit()
+    return len(fixed)
+
+async def run_consistency_checker(interval: float = AGGREGATE_CHECK_INTERVAL_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                fixed = await rebuild_drifted_aggregates(db)
+            # Repairs bump the class versions, so caches and ranks reload on their own
+            if fixed:
+                logger.warning(f"Repaired drifted grade aggregates for {fixed} students")
+        except Exception as e:
+            logger.error(f"Aggregate consistency check failed: {str(e)}")
+
+def start_consistency_checker():
+    global _checker_task
+    if AGGREGATE_CHECK_INTERVAL_SECONDS > 0 and _checker_task is None:
+        _checker_task = asyncio.create_task(run_consistency_checker())
+
+async def stop_consistency_checker():
+    global _checker_task
+    if _checker_task is not None:
+        _checker_task.cancel()
+        await asyncio.gather(_checker_task, return_exceptions=True)
+        _checker_task = None
@@ -0,0 +1,146 @@
+from typing import Optional
+from sqlalchemy import select, func, case, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+from ..models.database import Student, Class
+from .response_cache import ResponseCache
+
+# Thresholds for counting a student as at risk
+AT_RISK_GPA = float(os.getenv("AT_RISK_GPA", "2.0"))
+AT_RISK_ATTENDANCE = float(os.getenv("AT_RISK_ATTENDANCE", "80"))
+# Cached stats are dropped on writes in this process and reloaded when another
+# worker's write moves the data version; the TTL only bounds memory use
+DB_STATS_CACHE_TTL_SECONDS = float(os.getenv("DB_STATS_CACHE_TTL_SECONDS", "60"))
+DB_STATS_CACHE_MAX_ENTRIES = int(os.getenv("DB_STATS_CACHE_MAX_ENTRIES", "1024"))
+
+# (label, lower bound inclusive, upper bound exclusive)
+ATTENDANCE_BUCKETS = [("below_75", None, 75), ("75_85", 75, 85), ("85_95", 85, 95), ("95_plus", 95, None)]
+
+SCHOOL_KEY = "__school__"
+
+# Computed analytics per class, plus the school-wide summary under SCHOOL_KEY
+stats_cache = ResponseCache(max_entries=DB_STATS_CACHE_MAX_ENTRIES, ttl_seconds=DB_STATS_CACHE_TTL_SECONDS)
+
+def invalidate_class_stats(class_id: str):
+    """Drop a class's stats and the school summary that includes them."""
+    stats_cache.delete(class_id)
+    stats_cache.delete(SCHOOL_KEY)
+
+def _round(value, digits: int = 2):
+    return None if value is None else round(float(value), digits)
+
+def _graded_gpa():
+    """GPA of students with at least one test, NULL (skipped by aggregates) otherwise.
+
+    Students without tests have a placeholder GPA of 0.0 that would drag
+    averages down and mark every new student as at risk.
+    """
+    return case((Student.test_count > 0, Student.gpa))
+
+def _group_columns():
+    at_risk = or_(_graded_gpa() < AT_RISK_GPA, Student.attendance_percentage < AT_RISK_ATTENDANCE)
+    return [
+        func.count(Student.id).label("student_count"),
+        func.avg(_graded_gpa()).label("average_gpa"),
+        func.avg(Student.attendance_percentage).label("average_attendance"),
+        func.coalesce(func.sum(case((at_risk, 1), else_=0)), 0).label("at_risk_count"),
+    ]
+
+def _overall_columns():
+    buckets = []
+    for label, low, high in ATTENDANCE_BUCKETS:
+        conditions = []
+        if low is not None:
+            conditions.append(Student.attendance_percentage >= low)
+        if high is not None:
+            conditions.append(Student.attendance_percentage < high)
+        buckets.append(func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0).label(label))
+    return _group_columns() + [
+        func.min(_graded_gpa()).label("min_gpa"),
+        func.max(_graded_gpa()).label("max_gpa"),
+        func.sum(Student.homework_total).label("homework_total"),
+        func.sum(Student.homework_count).label("homework_count"),
+    ] + buckets
+
+def _group_stats(row) -> dict:
+    return {
+        "student_count": row.student_count,
+        "average_gpa": _round(row.average_gpa),
+        "average_attendance": _round(row.average_attendance),
+        "at_risk_count": row.at_risk_count,
+    }
+
+async def _overall_stats(db: AsyncSession, class_id: Optional[str] = None) -> dict:
+    query = select(*_overall_columns())
+    completed_query = select(Student.homework_completed, Student.homework_count)
+    if class_id is not None:
+        query = query.where(Student.class_id == class_id)
+        completed_query = completed_query.where(Student.class_id == class_id)
+    row = (await db.execute(query)).one()
+
+    # homework_completed is stored as "done/assigned" text, which doesn't
+    # aggregate portably in SQL, so this one narrow column is summed here.
+    # Grade writes store "n/n" for n graded homeworks, which says nothing about
+    # assignments missed, so only values recorded some other way are counted.
+    done = assigned = 0
+    for value, graded in (await db.execute(completed_query)).all():
+        parts = (value or "").split("/")
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            if int(parts[0]) == int(parts[1]) == graded:
+                continue
+            done += int(parts[0])
+            assigned += int(parts[1])
+
+    return {
+        **_group_stats(row),
+        "min_gpa": _round(row.min_gpa),
+        "max_gpa": _round(row.max_gpa),
+        "attendance_distribution": {label: getattr(row, label) for label, _, _ in ATTENDANCE_BUCKETS},
+        "homework_average": _round(row.homework_total / row.homework_count) if row.homework_count else None,
+        "homework_completion_rate": round(done / assigned, 4) if assigned else None,
+    }
+
+async def class_stats(db: AsyncSession, class_id: str, version: int) -> Optional[dict]:
+    """Aggregates for one class and each of its sections, or None if the class doesn't exist.
+
+    version is the class's current data version; cached stats from any other version are recomputed.
+    """
+    cached = stats_cache.get(class_id, version)
+    if cached is not None:
+        return cached
+    class_obj = await db.get(Class, class_id)
+    if class_obj is None:
+        return None
+    sections = await db.execute(
+        select(Student.section, *_group_columns())
+        .where(Student.class_id == class_id)
+        .group_by(Student.section)
+        .order_by(Student.section)
+    )
+    stats = {
+        "class_id": class_id,
+        "name": class_obj.name,
+        **(await _overall_stats(db, class_id)),
+        "sections": [{"section": row.section, **_group_stats(row)} for row in sections],
+    }
+    stats_cache.set(class_id, stats, version)
+    return stats
+
+async def school_stats(db: AsyncSession, version: int) -> dict:
+    """School-wide aggregates with a summary row per class, cached per all-classes version."""
+    cached = stats_cache.get(SCHOOL_KEY, version)
+    if cached is not None:
+        return cached
+    classes = await db.execute(
+        select(Class.id, Class.name, *_group_columns())
+        .select_from(Class)
+        .outerjoin(Student, Student.class_id == Class.id)
+        .group_by(Class.id, Class.name)
+        .order_by(Class.id)
+    )
+    stats = {
+        **(await _overall_stats(db)),
+        "classes": [{"class_id": row.id, "name": row.name, **_group_stats(row)} for row in classes],
+    }
+    stats_cache.set(SCHOOL_KEY, stats, version)
+    return stats
@@ -0,0 +1,56 @@
+from typing import Optional
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+import httpx
+import os
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Upstream connection pool limits, configurable per deployment
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "50"))
+ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "20"))
+ANTHROPIC_KEEPALIVE_EXPIRY = float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "30"))
+
+# Process-wide client shared by every WebSocket connection
+_client: Optional[AsyncAnthropic] = None
+
+def create_anthropic_client() -> AsyncAnthropic:
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise Exception("ANTHROPIC_API_KEY not found in environment variables")
+
+    limits = httpx.Limits(
+        max_connections=ANTHROPIC_MAX_CONNECTIONS,
+        max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=ANTHROPIC_KEEPALIVE_EXPIRY,
+    )
+    logger.info(
+        f"Creating shared Anthropic client (max_connections={limits.max_connections}, "
+        f"max_keepalive={limits.max_keepalive_connections})"
+    )
+    return AsyncAnthropic(api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=limits))
+
+def get_anthropic_client() -> AsyncAnthropic:
+    """Return the shared client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = create_anthropic_client()
+    return _client
+
+def init_anthropic_client():
+    """Create the shared client at startup so the first socket doesn't pay for it."""
+    if not os.getenv("ANTHROPIC_API_KEY"):
+        logger.warning("ANTHROPIC_API_KEY not set; chat will be unavailable")
+        return
+    get_anthropic_client()
+
+async def close_anthropic_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+        logger.info("Closed shared Anthropic client")
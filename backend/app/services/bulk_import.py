@@ -0,0 +1,94 @@
+from typing import AsyncIterator, List, Optional, Tuple
+import codecs
+import csv
+import os
+from . import fast_json
+
+# Rows written per transaction by the bulk import endpoints
+DB_IMPORT_CHUNK_SIZE = int(os.getenv("DB_IMPORT_CHUNK_SIZE", "500"))
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+JSONL_CONTENT_TYPES = {"application/x-ndjson", "application/jsonl", "application/json-lines", "application/x-jsonlines"}
+
+# (row number, record or None, error or None)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if media_type in JSONL_CONTENT_TYPES:
+        return "jsonl"
+    return None
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding the whole body in memory."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    header = None
+    row_number = 0
+    pending = ""
+    async for line in lines:
+        # A quoted field may span lines; wait until the quotes balance
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, {name: value for name, value in zip(header, values) if value != ""}, None
+    if pending:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+async def iter_jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = fast_json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, record, None
+
+async def iter_chunks(
+    chunks: AsyncIterator[bytes], fmt: str, chunk_size: int = DB_IMPORT_CHUNK_SIZE
+) -> AsyncIterator[List[ParsedRow]]:
+    """Parse a CSV or JSON Lines body into lists of at most chunk_size rows."""
+    parse = iter_csv_records if fmt == "csv" else iter_jsonl_records
+    batch: List[ParsedRow] = []
+    async for row in parse(iter_lines(chunks)):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def format_validation_error(error) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+    )
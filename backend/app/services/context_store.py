@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional
+import hashlib
+import zlib
+
+def hash_context(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+def apply_patch(base: str, ops: List[dict]) -> str:
+    """Apply splice ops ({"start", "end", "text"}) to base.
+
+    Offsets refer to the base string in UTF-16 code units so they match
+    JavaScript string indexing on the client. Ops must not overlap.
+    """
+    encoded = base.encode("utf-16-le")
+    length = len(encoded) // 2
+    previous_start = length
+    for op in sorted(ops, key=lambda op: op["start"], reverse=True):
+        start, end = int(op["start"]), int(op["end"])
+        if not 0 <= start <= end <= previous_start:
+            raise ValueError("Invalid context patch range")
+        encoded = encoded[:start * 2] + op.get("text", "").encode("utf-16-le") + encoded[end * 2:]
+        previous_start = start
+    return encoded.decode("utf-16-le")
+
+class ContextStore:
+    """Content-addressed, compressed store of page contexts shared by all clients.
+
+    Identical pages sent by different sockets are kept once; entries are
+    reference counted and dropped when the last client lets go of them.
+    """
+
+    def __init__(self, compression_level: int = 6):
+        self.compression_level = compression_level
+        self.blobs: Dict[str, bytes] = {}
+        self.refcounts: Dict[str, int] = {}
+        self.raw_sizes: Dict[str, int] = {}
+
+    def put(self, context: str) -> str:
+        context_hash = hash_context(context)
+        if context_hash not in self.blobs:
+            raw = context.encode("utf-8")
+            self.blobs[context_hash] = zlib.compress(raw, self.compression_level)
+            self.raw_sizes[context_hash] = len(raw)
+            self.refcounts[context_hash] = 0
+        self.refcounts[context_hash] += 1
+        return context_hash
+
+    def put_blob(self, context_hash: str, blob: bytes, raw_size: int = 0):
+        """Add an already-compressed entry (e.g. loaded from a session store) with one reference."""
+        if context_hash not in self.blobs:
+            self.blobs[context_hash] = blob
+            self.raw_sizes[context_hash] = raw_size
+            self.refcounts[context_hash] = 0
+        self.refcounts[context_hash] += 1
+
+    def get_blob(self, context_hash: str) -> Optional[bytes]:
+        return self.blobs.get(context_hash)
+
+    def acquire(self, context_hash: str) -> bool:
+        """Take another reference on an existing entry, if it is still stored."""
+        if context_hash not in self.blobs:
+            return False
+        self.refcounts[context_hash] += 1
+        return True
+
+    def release(self, context_hash: str):
+        if context_hash not in self.refcounts:
+            return
+        self.refcounts[context_hash] -= 1
+        if self.refcounts[context_hash] <= 0:
+            del self.refcounts[context_hash]
+            del self.blobs[context_hash]
+            del self.raw_sizes[context_hash]
+
+    def get(self, context_hash: str) -> Optional[str]:
+        blob = self.blobs.get(context_hash)
+        if blob is None:
+            return None
+        return zlib.decompress(blob).decode("utf-8")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.blobs),
+            "references": sum(self.refcounts.values()),
+            "raw_bytes": sum(self.raw_sizes.values()),
+            "stored_bytes": sum(len(blob) for blob in self.blobs.values()),
+        }
+
+context_store = ContextStore()
@@ -0,0 +1,39 @@
+from typing import AsyncIterator, List, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+import csv
+import io
+import os
+from . import fast_json
+
+# Rows fetched per round trip while streaming an export
+DB_EXPORT_BATCH_SIZE = int(os.getenv("DB_EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return fast_json.dumps(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def encode_rows(rows: Sequence, fields: List[str], fmt: str) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue()
+    return "".join(fast_json.dumps(dict(zip(fields, row))) + "\n" for row in rows)
+
+async def stream_rows(bind, query, fields: List[str], fmt: str, batch_size: int = DB_EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """Yield a query's rows as NDJSON or CSV text, one fetched batch at a time.
+
+    Uses its own session so the export isn't tied to the request's
+    dependency lifetime; only one batch is held in memory at once.
+    """
+    async with AsyncSession(bind) as session:
+        if fmt == "csv":
+            yield encode_rows([fields], fields, fmt)
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield encode_rows(partition, fields, fmt)
@@ -0,0 +1,34 @@
+"""JSON encoding for database columns and API responses.
+
+Uses orjson when it is installed and falls back to the standard library.
+Set JSON_BACKEND=json to force the fallback.
+"""
+from fastapi.responses import JSONResponse
+import json
+import os
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson")
+
+try:
+    if JSON_BACKEND != "orjson":
+        raise ImportError
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    DefaultJSONResponse = JSONResponse
+
+    def dumps(obj) -> str:
+        return json.dumps(obj)
+
+    def loads(data):
+        return json.loads(data)
@@ -0,0 +1,46 @@
+from typing import List
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import Student, IdSequence
+
+STUDENT_SEQUENCE = "students"
+STUDENT_ID_PREFIX = "ST"
+
+def format_student_id(number: int) -> str:
+    # Zero-padded to four digits, growing past ST9999 as needed
+    return f"{STUDENT_ID_PREFIX}{number:04d}"
+
+def highest_student_number(ids) -> int:
+    numbers = [int(student_id[len(STUDENT_ID_PREFIX):]) for student_id in ids
+               if student_id.startswith(STUDENT_ID_PREFIX) and student_id[len(STUDENT_ID_PREFIX):].isdigit()]
+    return max(numbers, default=0)
+
+async def allocate_student_ids(db: AsyncSession, count: int = 1) -> List[str]:
+    """Reserve count consecutive student IDs in the caller's transaction.
+
+    The sequence row is bumped with a single UPDATE, which takes the row
+    (or, on SQLite, database) write lock, so concurrent requests can't be
+    handed the same IDs. IDs come back to the pool if the transaction
+    rolls back.
+    """
+    result = await db.execute(
+        update(IdSequence)
+        .where(IdSequence.name == STUDENT_SEQUENCE)
+        .values(value=IdSequence.value + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        last = await db.scalar(select(IdSequence.value).where(IdSequence.name == STUDENT_SEQUENCE))
+    else:
+        # First allocation in a database that predates the sequence: start
+        # after the highest existing ID (a one-time scan)
+        start = highest_student_number((await db.execute(select(Student.id))).scalars())
+        last = start + count
+        try:
+            async with db.begin_nested():
+                db.add(IdSequence(name=STUDENT_SEQUENCE, value=last))
+        except IntegrityError:
+            # Another request created the sequence first
+            return await allocate_student_ids(db, count)
+    return [format_student_id(number) for number in range(last - count + 1, last + 1)]
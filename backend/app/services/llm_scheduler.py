@@ -0,0 +1,113 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Optional
+import asyncio
+import os
+import time
+
+# Upper bound on concurrent upstream LLM calls per process
+CHAT_MAX_CONCURRENT_LLM_CALLS = int(os.getenv("CHAT_MAX_CONCURRENT_LLM_CALLS", "8"))
+
+class FairLLMScheduler:
+    """Global concurrency limiter for LLM calls with round-robin fairness per client.
+
+    Up to max_concurrent calls run at once. Further requests wait in a
+    per-client queue, and freed slots are handed out one client at a time
+    so a single chatty socket can't starve the others.
+    """
+
+    def __init__(self, max_concurrent: int = CHAT_MAX_CONCURRENT_LLM_CALLS):
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        # Rotation order of clients with waiting requests
+        self.queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.granted = 0
+        self.queued = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def position(self, future: asyncio.Future) -> int:
+        """1-based position of a waiting request in the round-robin service order."""
+        queues = [list(queue) for queue in self.queues.values()]
+        position = 0
+        for round_index in range(max((len(queue) for queue in queues), default=0)):
+            for queue in queues:
+                if round_index < len(queue):
+                    position += 1
+                    if queue[round_index] is future:
+                        return position
+        return 0
+
+    def _remove(self, client_id: str, future: asyncio.Future):
+        queue = self.queues.get(client_id)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self.queues[client_id]
+
+    async def acquire(self, client_id: str, on_queued: Optional[Callable[[int], Awaitable[None]]] = None):
+        started = time.monotonic()
+        if self.active < self.max_concurrent and not self.queues:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.queues.setdefault(client_id, deque()).append(future)
+            self.queued += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            try:
+                if on_queued is not None:
+                    await on_queued(self.position(future))
+                await future
+            except BaseException:
+                if future.done() and not future.cancelled():
+                    # A slot was handed to us just as we gave up; pass it on
+                    self.release()
+                else:
+                    future.cancel()
+                    self._remove(client_id, future)
+                raise
+        waited = time.monotonic() - started
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self):
+        # Hand the slot directly to the next waiting client in rotation
+        while self.queues:
+            client_id, queue = next(iter(self.queues.items()))
+            future = queue.popleft()
+            if queue:
+                self.queues.move_to_end(client_id)
+            else:
+                del self.queues[client_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, on_queued: Optional[Callable[[int], Awaitable[None]]] = None):
+        await self.acquire(client_id, on_queued)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "granted": self.granted,
+            "queued": self.queued,
+            "avg_wait_seconds": round(self.total_wait / self.granted, 4) if self.granted else 0.0,
+            "max_wait_seconds": round(self.max_wait, 4),
+        }
+
+llm_scheduler = FairLLMScheduler()
@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import os
+import time
+from ..models.database import Class, Section
+from .response_cache import ResponseCache
+
+# Writes through the router invalidate immediately. Reads that pass the current
+# data version reload when another worker's write moved it; the TTLs bound
+# staleness for the unversioned checks made on the write path
+DB_CATALOG_CACHE_TTL_SECONDS = float(os.getenv("DB_CATALOG_CACHE_TTL_SECONDS", "300"))
+DB_STUDENT_CACHE_MAX_ENTRIES = int(os.getenv("DB_STUDENT_CACHE_MAX_ENTRIES", "2048"))
+DB_STUDENT_CACHE_TTL_SECONDS = float(os.getenv("DB_STUDENT_CACHE_TTL_SECONDS", "60"))
+
+class CatalogCache:
+    """Read-through copy of the classes and sections tables.
+
+    Both tables are small and rarely written, so they are loaded together
+    and served from memory until a write invalidates them, or until a read
+    passes a catalog version other than the one they were loaded at.
+    """
+
+    def __init__(self, ttl_seconds: float = DB_CATALOG_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.classes: Optional[List[dict]] = None
+        self.sections: Dict[str, List[str]] = {}
+        self.expires_at = 0.0
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = asyncio.Lock()
+
+    def _fresh(self, version: Optional[int]) -> bool:
+        return (
+            self.classes is not None and self.expires_at > time.monotonic()
+            and (version is None or version == self.version)
+        )
+
+    async def _load(self, db: AsyncSession, version: Optional[int] = None) -> bool:
+        """Make sure the cache is populated; True if it was read from the database just now.
+
+        version is the catalog's current data version, when the caller has read it.
+        """
+        if self._fresh(version):
+            self.hits += 1
+            return False
+        async with self.lock:
+            if self._fresh(version):
+                self.hits += 1
+                return False
+            self.misses += 1
+            classes = (await db.execute(select(Class.id, Class.name))).all()
+            sections: Dict[str, List[str]] = {}
+            for class_id, name in (await db.execute(select(Section.class_id, Section.name).order_by(Section.id))).all():
+                sections.setdefault(class_id, []).append(name)
+            self.classes = [{"id": class_id, "name": name} for class_id, name in classes]
+            self.sections = sections
+            self.expires_at = time.monotonic() + self.ttl_seconds
+            self.version = version
+            return True
+
+    async def get_classes(self, db: AsyncSession, version: Optional[int] = None) -> List[dict]:
+        await self._load(db, version)
+        return self.classes
+
+    async def get_sections(self, db: AsyncSession, class_id: str, version: Optional[int] = None) -> List[str]:
+        await self._load(db, version)
+        return self.sections.get(class_id, [])
+
+    async def _contains(self, db: AsyncSession, check) -> bool:
+        loaded = await self._load(db)
+        if check() or loaded:
+            return check()
+        # A cached "no" is re-checked against the database in case another
+        # worker added the row; valid input, the common case, never pays for this
+        self.invalidate()
+        await self._load(db)
+        return check()
+
+    async def has_class(self, db: AsyncSession, class_id: str) -> bool:
+        return await self._contains(db, lambda: any(class_obj["id"] == class_id for class_obj in self.classes))
+
+    async def has_section(self, db: AsyncSession, class_id: str, name: str) -> bool:
+        return await self._contains(db, lambda: name in self.sections.get(class_id, []))
+
+    async def valid_sections(self, db: AsyncSession) -> set:
+        """Every (class_id, section name) pair."""
+        await self._load(db)
+        return {(class_id, name) for class_id, names in self.sections.items() for name in names}
+
+    def invalidate(self):
+        self.classes = None
+        self.sections = {}
+        self.version = None
+
+    def clear(self):
+        self.invalidate()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.classes or []) + sum(len(names) for names in self.sections.values()),
+        }
+
+catalog_cache = CatalogCache()
+
+# Serialized GET /db/students/{id} responses
+student_cache = ResponseCache(max_entries=DB_STUDENT_CACHE_MAX_ENTRIES, ttl_seconds=DB_STUDENT_CACHE_TTL_SECONDS)
@@ -0,0 +1,164 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+
+# GPAs are kept to one decimal on a 4.0 scale, so each cohort needs only 41 buckets
+GPA_BUCKETS = 41
+
+# (upper bound of "Top N%", label), checked in order
+RANK_TIERS = [(5, "Top 5%"), (10, "Top 10%"), (25, "Top 25%"), (50, "Top 50%")]
+DEFAULT_RANK = "Average"
+# Stored for students with no tests yet
+NEW_STUDENT_RANK = "New Student"
+# The best of n students can't rank above the top 100/n percent, so smaller
+# cohorts get this label instead of a percentile
+RANK_MIN_COHORT_SIZE = int(os.getenv("RANK_MIN_COHORT_SIZE", "5"))
+UNRANKED = "Unranked"
+
+Cohort = Tuple[str, int]
+
+def gpa_bucket(gpa: float) -> int:
+    return min(max(int(round(gpa * 10)), 0), GPA_BUCKETS - 1)
+
+def rank_label(top_percent: float) -> str:
+    for limit, label in RANK_TIERS:
+        if top_percent <= limit:
+            return label
+    return DEFAULT_RANK
+
+class FenwickTree:
+    """Counts per bucket with O(log n) point updates and prefix sums."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree: List[int] = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, index: int, delta: int):
+        self.total += delta
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        """Number of entries in buckets [0, index]."""
+        count = 0
+        index += 1
+        while index > 0:
+            count += self.tree[index]
+            index -= index & -index
+        return count
+
+class RankEngine:
+    """Per-cohort (class, grade level) GPA distribution for cohort-relative ranks.
+
+    Only students with at least one test are ranked. The engine is per
+    process: it's loaded lazily from the database and remembers the data
+    version of each class it holds, so a class another worker wrote to is
+    reloaded on the next read (see ensure_rank_engine).
+    """
+
+    def __init__(self, min_cohort_size: int = RANK_MIN_COHORT_SIZE):
+        self.min_cohort_size = min_cohort_size
+        self.cohorts: Dict[Cohort, FenwickTree] = {}
+        self.students: Dict[str, Tuple[Cohort, int]] = {}
+        # Data version each class was last loaded or advanced at
+        self.versions: Dict[str, int] = {}
+        self.loaded = False
+
+    def reset(self):
+        self.cohorts.clear()
+        self.students.clear()
+        self.versions.clear()
+        self.loaded = False
+
+    def load(self, rows: Iterable[Tuple[str, str, int, float]], class_ids: Optional[Iterable[str]] = None):
+        """Replace the contents with (student_id, class_id, grade, gpa) rows.
+
+        With class_ids, only the students of those classes are replaced.
+        """
+        if class_ids is None:
+            self.reset()
+        else:
+            class_ids = set(class_ids)
+            for student_id in [student_id for student_id, (cohort, _) in self.students.items() if cohort[0] in class_ids]:
+                self.remove(student_id)
+        for student_id, class_id, grade, gpa in rows:
+            self.update(student_id, class_id, grade, gpa)
+        self.loaded = True
+
+    def stale_classes(self, versions: Dict[str, int]) -> set:
+        """Classes whose current data version differs from the one the engine holds."""
+        return {
+            class_id for class_id in set(versions) | set(self.versions)
+            if versions.get(class_id, 0) != self.versions.get(class_id, 0)
+        }
+
+    def advance(self, class_id: str, version: int):
+        """Record a committed write that the engine already reflects.
+
+        Only the next version is accepted; a gap means another worker wrote
+        to the class in between, so it is left stale and reloaded on next use.
+        """
+        if self.versions.get(class_id, 0) == version - 1:
+            self.versions[class_id] = version
+
+    def update(self, student_id: str, class_id: str, grade: int, gpa: float):
+        self.remove(student_id)
+        cohort = (class_id, grade)
+        bucket = gpa_bucket(gpa)
+        tree = self.cohorts.get(cohort)
+        if tree is None:
+            tree = self.cohorts[cohort] = FenwickTree(GPA_BUCKETS)
+        tree.add(bucket, 1)
+        self.students[student_id] = (cohort, bucket)
+
+    def remove(self, student_id: str):
+        entry = self.students.pop(student_id, None)
+        if entry is None:
+            return
+        cohort, bucket = entry
+        tree = self.cohorts[cohort]
+        tree.add(bucket, -1)
+        if tree.total == 0:
+            del self.cohorts[cohort]
+
+    def top_percent(self, student_id: str) -> Optional[float]:
+        """Share of the cohort ranked at or above the student, e.g. 10.0 for the top tenth.
+
+        Students tied on GPA share the best position among them.
+        """
+        entry = self.students.get(student_id)
+        if entry is None:
+            return None
+        cohort, bucket = entry
+        tree = self.cohorts[cohort]
+        higher = tree.total - tree.prefix(bucket)
+        return (higher + 1) / tree.total * 100
+
+    def rank(self, student_id: str) -> Optional[str]:
+        top_percent = self.top_percent(student_id)
+        if top_percent is None:
+            return None
+        if self.cohorts[self.students[student_id][0]].total < self.min_cohort_size:
+            return UNRANKED
+        return rank_label(top_percent)
+
+    def rank_with(self, student_id: str, class_id: str, grade: int, gpa: float) -> str:
+        """Rank the student would have with this GPA, leaving the engine unchanged."""
+        cohort = (class_id, grade)
+        bucket = gpa_bucket(gpa)
+        tree = self.cohorts.get(cohort)
+        total = tree.total if tree else 0
+        higher = total - tree.prefix(bucket) if tree else 0
+        # Don't count the student's current entry against them
+        entry = self.students.get(student_id)
+        if entry is not None and entry[0] == cohort:
+            total -= 1
+            if entry[1] > bucket:
+                higher -= 1
+        if total + 1 < self.min_cohort_size:
+            return UNRANKED
+        return rank_label((higher + 1) / (total + 1) * 100)
+
+rank_engine = RankEngine()
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+import hashlib
+import os
+import re
+import time
+
+# Cache limits, configurable per deployment
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "300"))
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    return _whitespace.sub(" ", text or "").strip()
+
+def make_cache_key(context: str, message: str) -> str:
+    """Hash of the normalized page context plus the (case-folded) user message."""
+    digest = hashlib.sha256()
+    digest.update(normalize_text(context).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(message).lower().encode("utf-8"))
+    return digest.hexdigest()
+
+class ResponseCache:
+    """Size- and TTL-bounded LRU cache, used for assistant replies and other lookups.
+
+    Entries can carry the data version they were built from; a get with a
+    different version is a miss, so callers never serve a body older than
+    the version they tag it with.
+    """
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl_seconds: float = CHAT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[float, Optional[int], Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: Optional[int] = None) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, entry_version, response = entry
+            if expires_at > time.monotonic() and (version is None or version == entry_version):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, response: Any, version: Optional[int] = None):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, version, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+response_cache = ResponseCache()
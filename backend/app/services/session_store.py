@@ -0,0 +1,155 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+# Where chat session state lives: "memory://" (per process) or "sqlite:///path/to/sessions.db"
+CHAT_SESSION_STORE_URL = os.getenv("CHAT_SESSION_STORE_URL", "memory://")
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+# Expired rows are deleted from a shared store once every this many saves
+CHAT_SESSION_PURGE_EVERY = int(os.getenv("CHAT_SESSION_PURGE_EVERY", "100"))
+
+class SessionStore(ABC):
+    """Interface for chat session state that can outlive a single socket or process.
+
+    A session is {"context_hash": str | None, "history": [turns]}. Page
+    contexts are stored separately, keyed by hash and already compressed,
+    so identical pages are shared between sessions.
+    """
+
+    @abstractmethod
+    async def load(self, client_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def save(self, client_id: str, state: dict):
+        ...
+
+    @abstractmethod
+    async def delete(self, client_id: str):
+        ...
+
+    @abstractmethod
+    async def load_context(self, context_hash: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def save_context(self, context_hash: str, blob: bytes):
+        ...
+
+    async def close(self):
+        pass
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store; sessions survive reconnects to the same worker only."""
+
+    def __init__(self, ttl_seconds: float = CHAT_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.sessions: Dict[str, Tuple[float, dict]] = {}
+        self.contexts: Dict[str, Tuple[float, bytes]] = {}
+
+    def _purge(self):
+        now = time.monotonic()
+        for entries in (self.sessions, self.contexts):
+            for key in [key for key, (expires_at, _) in entries.items() if expires_at <= now]:
+                del entries[key]
+
+    async def load(self, client_id: str) -> Optional[dict]:
+        self._purge()
+        entry = self.sessions.get(client_id)
+        return json.loads(json.dumps(entry[1])) if entry else None
+
+    async def save(self, client_id: str, state: dict):
+        self.sessions[client_id] = (time.monotonic() + self.ttl_seconds, json.loads(json.dumps(state)))
+
+    async def delete(self, client_id: str):
+        self.sessions.pop(client_id, None)
+
+    async def load_context(self, context_hash: str) -> Optional[bytes]:
+        self._purge()
+        entry = self.contexts.get(context_hash)
+        return entry[1] if entry else None
+
+    async def save_context(self, context_hash: str, blob: bytes):
+        # bytes are immutable, so this shares the blob held by the context store
+        self.contexts[context_hash] = (time.monotonic() + self.ttl_seconds, blob)
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file shared by every worker on the node."""
+
+    def __init__(
+        self, path: str, ttl_seconds: float = CHAT_SESSION_TTL_SECONDS, purge_every: int = CHAT_SESSION_PURGE_EVERY
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self.saves = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = asyncio.Lock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions "
+            "(client_id TEXT PRIMARY KEY, state BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS chat_contexts "
+            "(context_hash TEXT PRIMARY KEY, blob BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    async def _run(self, sql: str, params: tuple = ()):
+        # Keep file I/O off the event loop; one statement at a time per process
+        async with self.lock:
+            return await asyncio.to_thread(lambda: self.connection.execute(sql, params).fetchone())
+
+    async def load(self, client_id: str) -> Optional[dict]:
+        row = await self._run(
+            "SELECT state FROM chat_sessions WHERE client_id = ? AND expires_at > ?",
+            (client_id, time.time())
+        )
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    async def save(self, client_id: str, state: dict):
+        await self._run(
+            "INSERT OR REPLACE INTO chat_sessions (client_id, state, expires_at) VALUES (?, ?, ?)",
+            (client_id, zlib.compress(json.dumps(state).encode("utf-8")), time.time() + self.ttl_seconds)
+        )
+        # Expired rows are never read again, but would otherwise stay in the file forever
+        self.saves += 1
+        if self.purge_every > 0 and self.saves % self.purge_every == 0:
+            await self.purge_expired()
+
+    async def delete(self, client_id: str):
+        await self._run("DELETE FROM chat_sessions WHERE client_id = ?", (client_id,))
+
+    async def load_context(self, context_hash: str) -> Optional[bytes]:
+        row = await self._run(
+            "SELECT blob FROM chat_contexts WHERE context_hash = ? AND expires_at > ?",
+            (context_hash, time.time())
+        )
+        return bytes(row[0]) if row else None
+
+    async def save_context(self, context_hash: str, blob: bytes):
+        await self._run(
+            "INSERT OR REPLACE INTO chat_contexts (context_hash, blob, expires_at) VALUES (?, ?, ?)",
+            (context_hash, blob, time.time() + self.ttl_seconds)
+        )
+
+    async def purge_expired(self):
+        now = time.time()
+        await self._run("DELETE FROM chat_sessions WHERE expires_at <= ?", (now,))
+        await self._run("DELETE FROM chat_contexts WHERE expires_at <= ?", (now,))
+
+    async def close(self):
+        self.connection.close()
+
+def create_session_store(url: str = CHAT_SESSION_STORE_URL) -> SessionStore:
+    if url.startswith("memory://"):
+        return InMemorySessionStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported CHAT_SESSION_STORE_URL: {url}")
@@ -0,0 +1,82 @@
+from typing import List
+import html
+import json
+import math
+import os
+import re
+
+# Maximum estimated tokens of page context included in a prompt
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "4000"))
+
+_pieces = re.compile(r"\w+|[^\w\s]")
+_block_end = re.compile(r"</(tr|p|div|li|h[1-6]|thead|tbody|table|section)>|<br\s*/?>", re.IGNORECASE)
+_cell_end = re.compile(r"</t[dh]>", re.IGNORECASE)
+_tags = re.compile(r"<[^>]+>")
+_terms = re.compile(r"\w{3,}")
+
+def count_tokens(text: str) -> int:
+    """Estimate token count locally: ~4 characters per word piece, 1 per symbol."""
+    return sum(math.ceil(len(piece) / 4) for piece in _pieces.findall(text or ""))
+
+def _html_to_lines(markup: str) -> List[str]:
+    markup = _block_end.sub("\n", markup)
+    markup = _cell_end.sub(" | ", markup)
+    text = html.unescape(_tags.sub(" ", markup))
+    return [re.sub(r"\s+", " ", line).strip(" |") for line in text.split("\n")]
+
+def context_segments(context: str) -> List[str]:
+    """Split a page context into line-sized segments (one per table row where possible)."""
+    try:
+        parsed = json.loads(context)
+    except (ValueError, TypeError):
+        parsed = None
+    if isinstance(parsed, dict) and parsed.get("html"):
+        lines = _html_to_lines(parsed["html"])
+    elif isinstance(parsed, dict) and "text" in parsed:
+        lines = str(parsed["text"]).splitlines()
+    else:
+        lines = context.splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+def fit_context_to_budget(context: str, question: str, budget: int = CHAT_CONTEXT_TOKEN_BUDGET) -> str:
+    """Trim context to roughly budget tokens, keeping segments most relevant to the question.
+
+    Segments that mention terms from the question (student names, IDs,
+    test names...) are kept first; remaining room is filled in page order
+    so headings and the top of tables survive. Kept segments are emitted
+    in their original order with a note on how much was left out.
+    """
+    if count_tokens(context) <= budget:
+        return context
+
+    segments = context_segments(context)
+    terms = {term.lower() for term in _terms.findall(question or "")}
+
+    def relevance(index: int) -> int:
+        words = {word.lower() for word in _terms.findall(segments[index])}
+        return len(terms & words)
+
+    order = sorted(range(len(segments)), key=lambda index: (-relevance(index), index))
+    kept = set()
+    used = 0
+    for index in order:
+        cost = count_tokens(segments[index]) + 1
+        if used + cost > budget:
+            continue
+        kept.add(index)
+        used += cost
+
+    lines = []
+    omitted = 0
+    for index, segment in enumerate(segments):
+        if index in kept:
+            if omitted:
+                lines.append(f"[... {omitted} lines omitted ...]")
+                omitted = 0
+            lines.append(segment)
+        else:
+            omitted += 1
+    if omitted:
+        lines.append(f"[... {omitted} lines omitted ...]")
+    lines.append(f"[Context trimmed to fit budget: kept {len(kept)} of {len(segments)} lines]")
+    return "\n".join(lines)
@@ -0,0 +1,56 @@
+from typing import Dict, Iterable
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import DataVersion
+
+# Classes and sections share one counter; students and grades are versioned per class
+CATALOG_VERSION = "catalog"
+CLASS_VERSION_PREFIX = "class:"
+
+def class_version(class_id: str) -> str:
+    return f"{CLASS_VERSION_PREFIX}{class_id}"
+
+async def bump_versions(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """Increment counters in the caller's transaction, creating them on first use.
+
+    Returns the new value of each counter. The bumped rows stay locked until
+    the transaction ends, so no other write falls between them and these values.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    await db.execute(
+        update(DataVersion)
+        .where(DataVersion.name.in_(names))
+        .values(version=DataVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    existing = set((await db.execute(select(DataVersion.name).where(DataVersion.name.in_(names)))).scalars())
+    for name in names - existing:
+        try:
+            async with db.begin_nested():
+                db.add(DataVersion(name=name, version=1))
+        except IntegrityError:
+            # Created concurrently; count this write against it instead
+            await bump_versions(db, [name])
+    return dict((await db.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names))
+    )).all())
+
+async def get_version(db: AsyncSession, name: str) -> int:
+    return await db.scalar(select(DataVersion.version).where(DataVersion.name == name)) or 0
+
+async def get_class_versions(db: AsyncSession) -> Dict[str, int]:
+    """Current version of every class that has been written, by class id."""
+    rows = await db.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.like(f"{CLASS_VERSION_PREFIX}%"))
+    )
+    return {name[len(CLASS_VERSION_PREFIX):]: version for name, version in rows}
+
+async def get_all_classes_version(db: AsyncSession) -> int:
+    """Changes whenever any class's counter moves; counters only grow, so the sum does too."""
+    return await db.scalar(
+        select(func.coalesce(func.sum(DataVersion.version), 0))
+        .where(DataVersion.name.like(f"{CLASS_VERSION_PREFIX}%"))
+    )
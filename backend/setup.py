@@ -7,7 +7,7 @@ setup(
     install_requires=[
         "fastapi",
         "uvicorn",
-        "sqlalchemy",
+        "sqlalchemy[asyncio]",
         "pydantic",
         "python-jose[cryptography]",
         "passlib[bcrypt]",
@@ -19,4 +19,8 @@ setup(
         "httpx",
         "pytest-asyncio"
     ],
+    extras_require={
+        # Faster JSON for database columns and API responses
+        "fast": ["orjson"],
+    },
 )
@@ -1,33 +1,49 @@
 import os
 import sys
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 # Set testing environment variable
 os.environ["TESTING"] = "1"
 
+# App startup (init_db, the aggregate checker) uses the module-level engine,
+# so point it at a throwaway file instead of edutrack.db in the working tree
+_app_database = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_app_database.name, 'edutrack.db')}"
+
 # Add the backend directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from backend.app.models.database import Base, get_db
+from backend.app.models.database import Base, get_db, get_async_db
+from backend.app.services.rank_engine import rank_engine
+from backend.app.services.analytics import stats_cache
+from backend.app.services.lookup_cache import catalog_cache, student_cache
 from backend.main import app
 
-# Create in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite://"
+# Per-test SQLite file so the sync fixtures and the async handlers see the same data
+@pytest.fixture(scope="function")
+def database_path(tmp_path):
+    return tmp_path / "test.db"
 
 @pytest.fixture(scope="function")
-def engine():
+def engine(database_path):
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
+        f"sqlite:///{database_path}",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
         json_serializer=lambda obj: obj,
         json_deserializer=lambda obj: obj,
     )
-    return engine
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="function")
+def async_engine(database_path):
+    return create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
 
 @pytest.fixture(scope="function")
 def TestingSessionLocal(engine):
@@ -49,15 +65,28 @@ def db_session(engine, TestingSessionLocal):
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, async_engine):
     def override_get_db():
         try:
             yield db_session
         finally:
             db_session.close()
     
-    # Override the get_db dependency
+    AsyncTestingSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as session:
+            yield session
+    
+    # The rank engine and lookup caches are process-wide; rebuild them from this test's database
+    rank_engine.reset()
+    stats_cache.clear()
+    catalog_cache.clear()
+    student_cache.clear()
+    
+    # Override the database dependencies
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     
     # Create test client
     with TestClient(app) as test_client:
@@ -0,0 +1,187 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+
+class FakeStream:
+    def __init__(self, chunks, hang=False):
+        self.chunks = chunks
+        self.hang = hang
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.closed = True
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.hang:
+            await asyncio.Event().wait()
+
+def fake_client(chunks, hang=False):
+    client = MagicMock()
+    client.streams = []
+
+    def stream(**kwargs):
+        client.streams.append(FakeStream(chunks, hang))
+        return client.streams[-1]
+
+    client.messages.stream = MagicMock(side_effect=stream)
+    return client
+
+def test_chat_streams_response(client):
+    """Test that the chat socket streams deltas followed by a done frame"""
+    anthropic_client = fake_client(["Hello", ", ", "teacher"])
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/test-client") as websocket:
+            websocket.send_json({"type": "context", "content": "Class C101 roster"})
+            assert websocket.receive_json()["type"] == "context_ack"
+            websocket.send_json({"type": "message", "content": "How is the class doing?"})
+
+            frames = [websocket.receive_json() for _ in range(4)]
+
+    assert [frame["type"] for frame in frames] == ["delta", "delta", "delta", "done"]
+    assert "".join(frame["message"] for frame in frames[:3]) == "Hello, teacher"
+    assert frames[-1]["message"] == "Hello, teacher"
+    sent = anthropic_client.messages.stream.call_args.kwargs
+    assert "Class C101 roster" in sent["system"][-1]["text"]
+    assert sent["system"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert sent["messages"] == [{"role": "user", "content": "How is the class doing?"}]
+
+def test_chat_serves_repeated_question_from_cache(client):
+    """Test that an identical question on the same page skips the LLM call"""
+    from backend.app.services.response_cache import response_cache
+    response_cache.clear()
+    anthropic_client = fake_client(["Cached answer"])
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/first-teacher") as websocket:
+            websocket.send_json({"type": "context", "content": "Class C101 roster"})
+            assert websocket.receive_json()["type"] == "context_ack"
+            websocket.send_json({"type": "message", "content": "Who is at risk?"})
+            first = [websocket.receive_json() for _ in range(2)]
+        with client.websocket_connect("/ws/second-teacher") as websocket:
+            websocket.send_json({"type": "context", "content": "Class C101 roster"})
+            assert websocket.receive_json()["type"] == "context_ack"
+            websocket.send_json({"type": "message", "content": "  who is at RISK? ", "request_id": "q2"})
+            second = websocket.receive_json()
+
+    assert first[-1]["message"] == "Cached answer"
+    assert second == {"type": "done", "message": "Cached answer", "sender": "assistant", "request_id": "q2"}
+    assert anthropic_client.messages.stream.call_count == 1
+
+    stats = client.get("/chat/stats").json()["cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_chat_context_hash_and_patch(client):
+    """Test that clients can reuse a stored context by hash or send a patch"""
+    from backend.app.services.context_store import hash_context
+    anthropic_client = fake_client(["ok"])
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/first-client") as first:
+            first.send_json({"type": "context", "content": "Roster: Jane 3.5"})
+            context_hash = first.receive_json()["hash"]
+            assert context_hash == hash_context("Roster: Jane 3.5")
+
+            with client.websocket_connect("/ws/second-client") as second:
+                # Same page already stored by another client; no need to resend it
+                second.send_json({"type": "context", "hash": context_hash})
+                assert second.receive_json() == {"type": "context_ack", "hash": context_hash}
+
+                second.send_json({"type": "context", "hash": "unknown"})
+                assert second.receive_json() == {"type": "context_missing", "hash": "unknown"}
+
+                second.send_json({
+                    "type": "context_patch",
+                    "base_hash": context_hash,
+                    "ops": [{"start": 13, "end": 16, "text": "3.9"}]
+                })
+                assert second.receive_json()["hash"] == hash_context("Roster: Jane 3.9")
+
+                second.send_json({"type": "message", "content": "Summarize"})
+                [second.receive_json() for _ in range(2)]
+
+    sent = anthropic_client.messages.stream.call_args.kwargs
+    assert "Roster: Jane 3.9" in sent["system"][-1]["text"]
+
+def test_chat_replays_bounded_history(client):
+    """Test that follow-up questions carry the earlier turns of the conversation"""
+    anthropic_client = fake_client(["Answer"])
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/history-client") as websocket:
+            websocket.send_json({"type": "context", "content": "History roster"})
+            websocket.receive_json()
+            websocket.send_json({"type": "message", "content": "Who has the top GPA?"})
+            [websocket.receive_json() for _ in range(2)]
+            websocket.send_json({"type": "message", "content": "And the lowest?"})
+            [websocket.receive_json() for _ in range(2)]
+
+    messages = anthropic_client.messages.stream.call_args.kwargs["messages"]
+    assert [turn["role"] for turn in messages] == ["user", "assistant", "user"]
+    assert messages[0]["content"] == "Who has the top GPA?"
+    assert messages[1]["content"][0]["text"] == "Answer"
+    assert messages[1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert messages[2]["content"] == "And the lowest?"
+
+def test_chat_cancel_aborts_pending_request(client):
+    """Test that a cancel frame stops the in-flight LLM stream"""
+    anthropic_client = fake_client(["Partial"], hang=True)
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/cancel-client") as websocket:
+            websocket.send_json({"type": "context", "content": "Cancel roster"})
+            websocket.receive_json()
+            websocket.send_json({"type": "message", "content": "Long question", "request_id": "r1"})
+            assert websocket.receive_json() == {
+                "type": "delta", "message": "Partial", "sender": "assistant", "request_id": "r1"
+            }
+            websocket.send_json({"type": "cancel", "request_id": "r1"})
+            assert websocket.receive_json() == {"type": "cancelled", "request_id": "r1"}
+
+    assert anthropic_client.streams[0].closed
+
+def test_chat_parallel_requests_are_tagged(client):
+    """Test that parallel messages each get a done frame tagged with their request_id"""
+    anthropic_client = fake_client(["Answer"])
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with client.websocket_connect("/ws/parallel-client") as websocket:
+            websocket.send_json({"type": "context", "content": "Parallel roster"})
+            websocket.receive_json()
+            websocket.send_json({"type": "message", "content": "First", "request_id": "a", "parallel": True})
+            websocket.send_json({"type": "message", "content": "Second", "request_id": "b", "parallel": True})
+            frames = [websocket.receive_json() for _ in range(4)]
+
+    done = {frame["request_id"] for frame in frames if frame["type"] == "done"}
+    assert done == {"a", "b"}
+
+def test_chat_malformed_frame_reports_error(client):
+    """Test that a frame that isn't JSON gets an error reply without dropping the socket"""
+    from backend.app.routers.chat import manager
+    with client.websocket_connect("/ws/malformed-client") as websocket:
+        websocket.send_text("not json")
+        assert websocket.receive_json()["message"].startswith("Error:")
+        websocket.send_json({"type": "context", "content": "Malformed roster"})
+        assert websocket.receive_json()["type"] == "context_ack"
+        assert "malformed-client" in manager.active_connections
+
+def test_chat_unexpected_error_cancels_pending_requests(client):
+    """Test that a socket ending on an unexpected error still stops its streams and unregisters"""
+    from backend.app.routers.chat import manager
+    anthropic_client = fake_client(["Partial"], hang=True)
+    with patch("backend.app.routers.chat.get_anthropic_client", return_value=anthropic_client):
+        with pytest.raises(KeyError):
+            with client.websocket_connect("/ws/binary-client") as websocket:
+                websocket.send_json({"type": "context", "content": "Binary roster"})
+                websocket.receive_json()
+                websocket.send_json({"type": "message", "content": "Long question", "request_id": "r1"})
+                websocket.receive_json()
+                # receive_text() can't read a binary frame
+                websocket.send_bytes(b"\x00")
+                websocket.receive_json()
+
+    assert anthropic_client.streams[0].closed
+    assert "binary-client" not in manager.active_connections
+    assert "binary-client" not in manager.page_contexts
@@ -1,6 +1,8 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
-from app.models.database import Student as DBStudent, Class as DBClass, Section as DBSection
+from sqlalchemy import inspect, text
+from app.models.database import Student as DBStudent, Class as DBClass, Section as DBSection, Grade as DBGrade
 
 @pytest.fixture
 def sample_student():
@@ -102,3 +104,527 @@ def test_add_grade_student_not_found(client):
     response = client.post("/db/students/ST9999/grades", json=grade_data)
     assert response.status_code == 404
     assert response.json()["detail"] == "Student not found"
+
+def test_add_grade_rejects_zero_total_points(client, db_student):
+    """Test that a grade out of zero points is a validation error, not a server error"""
+    response = client.post(f"/db/students/{db_student.id}/grades", json={
+        "testName": "Quiz", "score": 5, "totalPoints": 0, "date": "2024-02-20", "gradeType": "test"
+    })
+    assert response.status_code == 422
+
+def test_add_grade_updates_gpa(client, db_student):
+    """Test adding test and homework grades to an existing student"""
+    grade_data = {
+        "testName": "Math Quiz 1",
+        "score": 45,
+        "totalPoints": 50,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    response = client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["academic_performance"]["tests"]["Math Quiz 1"] == "90%"
+    assert data["gpa"] == 3.6
+
+    homework_data = dict(grade_data, testName="Homework 1", score=8, totalPoints=10, gradeType="homework")
+    response = client.post(f"/db/students/{db_student.id}/grades", json=homework_data)
+    data = response.json()
+    assert data["academic_performance"]["homework"]["Homework 1"] == "80%"
+    assert data["homework_points"] == 80
+
+    # Changes are persisted, not just echoed back
+    data = client.get(f"/db/students/{db_student.id}").json()
+    assert data["academic_performance"]["tests"]["Math Quiz 1"] == "90%"
+    assert data["gpa"] == 3.6
+
+def test_add_grade_replaces_same_name(client, db_student):
+    """Test that re-entering a grade with the same name replaces the earlier score"""
+    grade_data = {
+        "testName": "Midterm",
+        "score": 50,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, testName="Final", score=100))
+    response = client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, score=80))
+    data = response.json()
+    assert data["academic_performance"]["tests"] == {"Midterm": "80%", "Final": "100%"}
+    assert data["gpa"] == 3.6
+
+def test_add_grade_replaces_concurrently_inserted_grade(client, db_student, monkeypatch):
+    """Test that losing an insert race on the same grade name turns into a replace"""
+    from backend.app.routers import db as db_router
+
+    grade_data = {
+        "testName": "Midterm",
+        "score": 60,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+
+    # The first lookup misses, as if the other request committed just after it
+    find_grade = db_router.find_grade
+    lookups = []
+
+    async def racing_find_grade(*args):
+        lookups.append(args)
+        return None if len(lookups) == 1 else await find_grade(*args)
+
+    monkeypatch.setattr(db_router, "find_grade", racing_find_grade)
+    response = client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, score=80))
+    assert response.status_code == 200
+    assert response.json()["academic_performance"]["tests"] == {"Midterm": "80%"}
+    assert response.json()["gpa"] == 3.2
+
+def test_failed_grade_write_saves_nothing(client, db_session, db_student, monkeypatch):
+    """Test that a grade and its aggregates are committed together or not at all"""
+    from backend.app.routers import db as db_router
+
+    async def failing_ensure_rank_engine(db):
+        raise RuntimeError("rank engine unavailable")
+
+    monkeypatch.setattr(db_router, "ensure_rank_engine", failing_ensure_rank_engine)
+    with pytest.raises(RuntimeError):
+        client.post(f"/db/students/{db_student.id}/grades", json={
+            "testName": "Atomic", "score": 90, "totalPoints": 100, "date": "2024-02-20", "gradeType": "test"
+        })
+
+    assert db_session.execute(text("SELECT COUNT(*) FROM grades")).scalar() == 0
+    assert db_session.execute(text("SELECT COUNT(*) FROM data_versions")).scalar() == 0
+    db_session.refresh(db_student)
+    assert db_student.test_count == 0
+
+def test_consistency_checker_repairs_drifted_aggregates(client, db_student, db_session, async_engine):
+    """Test that the background checker rebuilds aggregates that no longer match the grades"""
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.services.aggregates import rebuild_drifted_aggregates
+
+    grade_data = {
+        "testName": "Quiz",
+        "score": 90,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+
+    async def check():
+        async with sessionmaker(bind=async_engine, class_=AsyncSession)() as session:
+            return await rebuild_drifted_aggregates(session)
+
+    assert asyncio.run(check()) == 0
+
+    # Simulate drift, e.g. from a write that bypassed the API
+    db_session.refresh(db_student)
+    db_student.test_total = 10
+    db_student.gpa = 0.1
+    db_session.commit()
+
+    assert asyncio.run(check()) == 1
+    data = client.get(f"/db/students/{db_student.id}").json()
+    assert data["gpa"] == 3.6
+
+    # Homework drift is repaired in the fields the API reports, not just the counters
+    client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, testName="HW 1", gradeType="homework"))
+    db_session.refresh(db_student)
+    db_student.homework_total = 10
+    db_student.homework_points = 10
+    db_session.commit()
+
+    assert asyncio.run(check()) == 1
+    data = client.get(f"/db/students/{db_student.id}").json()
+    assert data["homework_points"] == 90
+    assert data["homework_completed"] == "1/1"
+
+    # With its only test gone, the student has no GPA or rank any more
+    db_session.execute(text("DELETE FROM grades WHERE grade_type = 'test'"))
+    db_session.commit()
+
+    assert asyncio.run(check()) == 1
+    db_session.refresh(db_student)
+    assert db_student.gpa == 0.0
+    assert db_student._academic_performance["rank"] == "New Student"
+
+def test_add_grade_ranks_within_cohort(client, db_session, db_student):
+    """Test that ranks follow the student's position among classmates, not fixed GPA cutoffs"""
+    for i in range(1, 10):
+        db_session.add(DBStudent(
+            id=f"ST{i + 1:04d}", name=f"Peer {i}", grade=10, class_id="C101", section="A",
+            gpa=3.9, test_count=1, test_total=98
+        ))
+    db_session.commit()
+
+    grade_data = {
+        "testName": "Midterm",
+        "score": 90,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    response = client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    assert response.status_code == 200
+    # A 3.6 GPA is last of ten in this cohort
+    assert response.json()["academic_performance"]["rank"] == "Average"
+
+    response = client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, score=100))
+    assert response.json()["gpa"] == 4.0
+    assert response.json()["academic_performance"]["rank"] == "Top 10%"
+    # Peers' ranks reflect the change without being rewritten
+    peer = client.get("/db/students/ST0002").json()
+    assert peer["academic_performance"]["rank"] == "Top 25%"
+
+def test_failed_grade_commit_leaves_ranks_alone(client, db_session, db_student, monkeypatch):
+    """Test that the rank engine only takes GPAs that were actually saved"""
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from backend.app.services.rank_engine import rank_engine
+
+    db_session.add(DBStudent(
+        id="ST0002", name="Peer", grade=10, class_id="C101", section="A", gpa=3.0, test_count=1, test_total=75
+    ))
+    db_session.commit()
+    # Rank a two-student cohort
+    monkeypatch.setattr(rank_engine, "min_cohort_size", 1)
+    grade_data = {
+        "testName": "Midterm",
+        "score": 100,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=dict(grade_data, score=50))
+    assert rank_engine.rank("ST0002") == "Top 50%"
+
+    async def failing_commit(self):
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    monkeypatch.setattr(AsyncSession, "commit", failing_commit)
+    with pytest.raises(OperationalError):
+        client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    assert rank_engine.rank("ST0002") == "Top 50%"
+    assert rank_engine.rank(db_student.id) == "Average"
+
+def test_list_students_paginates_filters_and_projects(client, db_session, db_student):
+    """Test keyset pagination, filters and the fields= projection on student listings"""
+    for i, gpa in enumerate([2.5, 3.0, 3.8], start=2):
+        db_session.add(DBStudent(
+            id=f"ST{i:04d}", name=f"Student {i}", grade=11 if i == 4 else 10, class_id="C101",
+            section="B", gpa=gpa
+        ))
+    db_session.commit()
+
+    response = client.get("/db/students", params={"limit": 3})
+    assert [s["id"] for s in response.json()] == ["ST0001", "ST0002", "ST0003"]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/db/students", params={"limit": 3, "cursor": cursor})
+    assert [s["id"] for s in response.json()] == ["ST0004"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/db/classes/C101/students", params={"section": "B", "min_gpa": 2.8, "grade": 10})
+    assert [s["id"] for s in response.json()] == ["ST0003"]
+
+    response = client.get("/db/students", params={"fields": "name,gpa", "max_gpa": 3.0})
+    assert response.json() == [
+        {"id": "ST0002", "name": "Student 2", "gpa": 2.5},
+        {"id": "ST0003", "name": "Student 3", "gpa": 3.0}
+    ]
+    response = client.get("/db/students", params={"fields": "academic_performance", "limit": 1})
+    assert response.json() == [{"id": "ST0001", "academic_performance": {"rank": "Top 10%", "tests": {}, "homework": {}}}]
+
+    assert client.get("/db/students", params={"fields": "password"}).status_code == 400
+
+def test_import_students_csv_reports_bad_rows(client, db_student):
+    """Test bulk student import from CSV with per-row errors"""
+    body = (
+        "name,grade,class_id,section\n"
+        "Ann Lee,10,C101,A\n"
+        "\"Smith, Bob\",11,C101,A\n"
+        "No Class,10,C999,A\n"
+        "Bad Grade,tenth,C101,A\n"
+    )
+    response = client.post("/db/students/import", content=body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 2
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [3, 4]
+    assert report["errors"][0]["error"] == "Invalid class or section"
+
+    names = {s["name"] for s in client.get("/db/classes/C101/students").json()}
+    assert names == {"Jane Smith", "Ann Lee", "Smith, Bob"}
+
+def test_import_grades_jsonl_updates_aggregates(client, db_student):
+    """Test bulk grade import from JSON Lines, including replaced grades and unknown students"""
+    lines = [
+        {"student_id": db_student.id, "testName": "Quiz 1", "score": 80, "totalPoints": 100, "date": "2024-02-01", "gradeType": "test"},
+        {"student_id": db_student.id, "testName": "Quiz 2", "score": 100, "totalPoints": 100, "date": "2024-02-08", "gradeType": "test"},
+        {"student_id": db_student.id, "testName": "Quiz 1", "score": 90, "totalPoints": 100, "date": "2024-02-01", "gradeType": "test"},
+        {"student_id": db_student.id, "testName": "HW 1", "score": 9, "totalPoints": 10, "date": "2024-02-02", "gradeType": "homework"},
+        {"student_id": "ST9999", "testName": "Quiz 1", "score": 80, "totalPoints": 100, "date": "2024-02-01", "gradeType": "test"},
+        {"student_id": db_student.id, "testName": "Quiz 3", "score": 5, "totalPoints": 0, "date": "2024-02-09", "gradeType": "test"},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+    response = client.post("/db/grades/import?format=jsonl", content=body)
+    report = response.json()
+    assert report["imported"] == 4
+    assert [error["row"] for error in report["errors"]] == [5, 6, 7]
+    assert report["errors"][1]["error"].startswith("totalPoints:")
+
+    data = client.get(f"/db/students/{db_student.id}").json()
+    assert data["academic_performance"]["tests"] == {"Quiz 1": "90%", "Quiz 2": "100%"}
+    assert data["gpa"] == 3.8
+    assert data["homework_completed"] == "1/1"
+
+    assert client.post("/db/grades/import", content=body).status_code == 415
+
+def test_student_ids_are_unique_under_concurrency(client, db_student, db_session, async_engine, sample_student):
+    """Test that parallel allocations never hand out the same ID and IDs grow past ST9999"""
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.services.id_allocator import allocate_student_ids
+
+    Session = sessionmaker(bind=async_engine, class_=AsyncSession)
+
+    async def allocate(count):
+        async with Session() as session:
+            ids = await allocate_student_ids(session, count)
+            await session.commit()
+            return ids
+
+    async def scenario():
+        return await asyncio.gather(*(allocate(count) for count in (1, 3, 1, 2)))
+
+    allocated = [student_id for ids in asyncio.run(scenario()) for student_id in ids]
+    # Numbering continues after the existing ST0001
+    assert sorted(allocated) == [f"ST{n:04d}" for n in range(2, 9)]
+
+    db_session.execute(text("UPDATE id_sequences SET value = 9999 WHERE name = 'students'"))
+    db_session.commit()
+    response = client.post("/db/students", json=sample_student)
+    assert response.json()["id"] == "ST10000"
+
+def test_export_round_trips_through_import(client, db_student):
+    """Test that streamed exports can be loaded back through the import endpoints"""
+    grade_data = {
+        "testName": "Midterm",
+        "score": 45,
+        "totalPoints": 50,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+
+    response = client.get("/db/students/export")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    students = [json.loads(line) for line in response.text.splitlines()]
+    assert [s["id"] for s in students] == [db_student.id]
+    assert "academic_performance" not in students[0]
+
+    response = client.get("/db/grades/export", params={"format": "csv", "class_id": "C101"})
+    lines = response.text.splitlines()
+    assert lines[0] == "student_id,testName,score,totalPoints,percentage,date,gradeType"
+    assert lines[1] == f"{db_student.id},Midterm,45,50,90,2024-02-20,test"
+    assert client.get("/db/grades/export", params={"class_id": "C999"}).text == ""
+
+    response = client.post("/db/grades/import", content=response.text, headers={"Content-Type": "text/csv"})
+    assert response.json() == {"imported": 1, "failed": 0, "errors": []}
+
+def test_undated_grades_round_trip_through_import(client, db_session, db_student):
+    """Test that grades stored without a date export and import back in both formats"""
+    db_session.add(DBGrade(
+        student_id=db_student.id, grade_type="test", name="Quiz 1", score=80, total_points=100, percentage=80
+    ))
+    db_session.commit()
+
+    for format, content_type in [("ndjson", "application/x-ndjson"), ("csv", "text/csv")]:
+        exported = client.get("/db/grades/export", params={"format": format}).text
+        response = client.post("/db/grades/import", content=exported, headers={"Content-Type": content_type})
+        assert response.json() == {"imported": 1, "failed": 0, "errors": []}
+
+    db_session.expire_all()
+    grade = db_session.query(DBGrade).one()
+    assert (grade.score, grade.date) == (80, None)
+
+def test_class_and_school_stats(client, db_session, db_student):
+    """Test SQL-computed class/school analytics and their invalidation on grade writes"""
+    db_student.test_count, db_student.test_total = 2, 175
+    db_session.add(DBStudent(
+        id="ST0002", name="John Doe", grade=10, class_id="C101", section="A", gpa=1.5,
+        attendance_percentage=70.0, homework_completed="5/20", test_count=1, test_total=38
+    ))
+    # No tests yet, and homework_completed only mirrors the graded homework
+    db_session.add(DBStudent(
+        id="ST0003", name="New Student", grade=10, class_id="C101", section="A", gpa=0.0,
+        attendance_percentage=100.0, homework_completed="2/2", homework_count=2, homework_total=150
+    ))
+    db_session.commit()
+
+    stats = client.get("/db/classes/C101/stats").json()
+    assert stats["student_count"] == 3
+    assert stats["average_gpa"] == 2.5
+    assert stats["min_gpa"] == 1.5
+    assert stats["at_risk_count"] == 1
+    assert stats["attendance_distribution"] == {"below_75": 1, "75_85": 0, "85_95": 0, "95_plus": 2}
+    assert stats["homework_completion_rate"] == 0.6
+    assert stats["homework_average"] == 75.0
+    assert stats["sections"] == [
+        {"section": "A", "student_count": 3, "average_gpa": 2.5, "average_attendance": 88.33, "at_risk_count": 1}
+    ]
+
+    school = client.get("/db/stats").json()
+    assert school["student_count"] == 3
+    assert school["classes"] == [
+        {"class_id": "C101", "name": "Mathematics", "student_count": 3, "average_gpa": 2.5,
+         "average_attendance": 88.33, "at_risk_count": 1}
+    ]
+
+    grade_data = {
+        "testName": "Midterm",
+        "score": 9,
+        "totalPoints": 10,
+        "date": "2024-02-20",
+        "gradeType": "homework"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    stats = client.get("/db/classes/C101/stats").json()
+    assert stats["homework_average"] == 80.0
+    # The grade write replaced ST0001's "19/20" with "1/1", which is no longer counted
+    assert stats["homework_completion_rate"] == 0.25
+    assert client.get("/db/stats").json()["homework_average"] == 80.0
+
+    assert client.get("/db/classes/C999/stats").status_code == 404
+
+def test_lookup_caches_serve_repeat_reads_and_invalidate_on_write(client, db_student):
+    """Test that class/section and student lookups are cached and dropped on writes"""
+    assert client.get("/db/classes").json() == {"classes": [{"id": "C101", "name": "Mathematics"}]}
+    client.get("/db/classes/C101/sections")
+    catalog = client.get("/db/cache/stats").json()["catalog"]
+    assert catalog["misses"] == 1
+    assert catalog["hits"] == 1
+
+    assert client.post("/db/sections", json={"name": "B", "class_id": "C101"}).status_code == 200
+    sections = client.get("/db/classes/C101/sections").json()["sections"]
+    assert [section["name"] for section in sections] == ["A", "B"]
+    assert client.post("/db/sections", json={"name": "B", "class_id": "C101"}).status_code == 400
+
+    first = client.get(f"/db/students/{db_student.id}").json()
+    assert client.get(f"/db/students/{db_student.id}").json() == first
+    assert client.get("/db/cache/stats").json()["students"]["hits"] == 1
+
+    grade_data = {
+        "testName": "Midterm",
+        "score": 80,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    assert client.get(f"/db/students/{db_student.id}").json()["academic_performance"]["tests"] == {"Midterm": "80%"}
+
+def test_conditional_get_returns_304_until_data_changes(client, db_student):
+    """Test ETags on read endpoints and their invalidation by writes"""
+    response = client.get("/db/students")
+    etag = response.headers["ETag"]
+    response = client.get("/db/students", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Different query parameters give a different payload, so a different tag
+    assert client.get("/db/students?fields=name", headers={"If-None-Match": etag}).status_code == 200
+
+    class_etag = client.get("/db/classes/C101/students").headers["ETag"]
+    classes_etag = client.get("/db/classes").headers["ETag"]
+
+    grade_data = {
+        "testName": "Midterm",
+        "score": 80,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    assert client.get("/db/students", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/db/classes/C101/students", headers={"If-None-Match": class_etag}).status_code == 200
+    assert client.get("/db/classes", headers={"If-None-Match": classes_etag}).status_code == 304
+
+    client.post("/db/sections", json={"name": "B", "class_id": "C101"})
+    assert client.get("/db/classes", headers={"If-None-Match": classes_etag}).status_code == 200
+
+def test_cached_reads_follow_writes_from_other_workers(client, db_session, db_student, monkeypatch):
+    """Test that a write made outside this process is served with its new tag, never the old body"""
+    from backend.app.services.rank_engine import rank_engine
+
+    # Rank a two-student cohort
+    monkeypatch.setattr(rank_engine, "min_cohort_size", 1)
+    grade_data = {
+        "testName": "Midterm",
+        "score": 80,
+        "totalPoints": 100,
+        "date": "2024-02-20",
+        "gradeType": "test"
+    }
+    client.post(f"/db/students/{db_student.id}/grades", json=grade_data)
+    db_session.add(DBStudent(
+        id="ST0002", name="Peer", grade=10, class_id="C101", section="A", gpa=3.0, test_count=1, test_total=75
+    ))
+    db_session.execute(text("UPDATE data_versions SET version = version + 1 WHERE name = 'class:C101'"))
+    db_session.execute(text("INSERT INTO data_versions (name, version) VALUES ('catalog', 1)"))
+    db_session.commit()
+
+    # Fill every cache in this process
+    sections = client.get("/db/classes/C101/sections")
+    student = client.get(f"/db/students/{db_student.id}")
+    stats = client.get("/db/classes/C101/stats")
+    school = client.get("/db/stats")
+    assert student.json()["academic_performance"]["rank"] == "Top 50%"
+
+    # Another worker adds a section and raises the peer's GPA above this student's
+    db_session.add(DBSection(name="Z", class_id="C101"))
+    db_session.execute(text("UPDATE students SET gpa = 4.0, test_total = 100 WHERE id = 'ST0002'"))
+    db_session.execute(text(
+        "UPDATE data_versions SET version = version + 1 WHERE name IN ('catalog', 'class:C101')"
+    ))
+    db_session.commit()
+
+    response = client.get("/db/classes/C101/sections", headers={"If-None-Match": sections.headers["ETag"]})
+    assert response.status_code == 200
+    assert "Z" in {section["name"] for section in response.json()["sections"]}
+
+    response = client.get(f"/db/students/{db_student.id}", headers={"If-None-Match": student.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.json()["academic_performance"]["rank"] == "Average"
+
+    response = client.get("/db/classes/C101/stats", headers={"If-None-Match": stats.headers["ETag"]})
+    assert response.json()["max_gpa"] == 4.0
+    response = client.get("/db/stats", headers={"If-None-Match": school.headers["ETag"]})
+    assert response.json()["max_gpa"] == 4.0
+
+def test_student_summaries_leave_out_json_fields(client, db_student):
+    """Test the lightweight roster views"""
+    expected = [{
+        "id": db_student.id, "name": "Jane Smith", "grade": 10, "class_id": "C101",
+        "section": "A", "gpa": 3.5, "attendance_percentage": 95.0
+    }]
+    assert client.get("/db/students/summary").json() == expected
+    assert client.get("/db/classes/C101/roster").json() == expected
+    assert client.get("/db/classes/C101/roster", params={"fields": "gpa"}).json() == [{"id": db_student.id, "gpa": 3.5}]
+    for path in ["/db/students/summary", "/db/classes/C101/roster"]:
+        response = client.get(path, params={"fields": "gpa,ai_insights"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown fields: ai_insights"
+
+def test_student_json_columns_are_deferred(db_session, db_student):
+    """Test that plain student queries leave the JSON columns unloaded"""
+    db_session.expunge_all()
+    student = db_session.query(DBStudent).first()
+    unloaded = inspect(student).unloaded
+    assert {"_academic_performance", "ai_insights"} <= unloaded
+    assert "gpa" not in unloaded
@@ -0,0 +1,53 @@
+import asyncio
+from backend.app.services.llm_scheduler import FairLLMScheduler
+
+def test_scheduler_serves_clients_round_robin():
+    """Test that queued requests are granted fairly across clients"""
+    async def scenario():
+        scheduler = FairLLMScheduler(max_concurrent=1)
+        order = []
+        positions = {}
+
+        async def request(client_id, name):
+            async def on_queued(position):
+                positions[name] = position
+            async with scheduler.slot(client_id, on_queued):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("busy")
+        tasks = [
+            asyncio.create_task(request("a", "a1")),
+            asyncio.create_task(request("a", "a2")),
+            asyncio.create_task(request("b", "b1")),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.depth == 3
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return scheduler, order, positions
+
+    scheduler, order, positions = asyncio.run(scenario())
+    assert order == ["a1", "b1", "a2"]
+    assert positions == {"a1": 1, "a2": 2, "b1": 2}
+    stats = scheduler.stats()
+    assert stats["active"] == 0
+    assert stats["depth"] == 0
+    assert stats["max_depth"] == 3
+    assert stats["granted"] == 4
+
+def test_scheduler_drops_cancelled_waiters():
+    """Test that a cancelled waiter leaves the queue and frees nothing twice"""
+    async def scenario():
+        scheduler = FairLLMScheduler(max_concurrent=1)
+        await scheduler.acquire("busy")
+        waiter = asyncio.create_task(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.depth == 0
+        scheduler.release()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.active == 0
@@ -0,0 +1,92 @@
+import json
+from sqlalchemy import create_engine, inspect, text
+from backend.app.models.migrations import upgrade, get_schema_version, LATEST_VERSION
+
+# Schema as created before versioning was introduced
+BASELINE_SCHEMA = [
+    "CREATE TABLE classes (id VARCHAR NOT NULL, name VARCHAR NOT NULL, PRIMARY KEY (id))",
+    "CREATE TABLE sections (id INTEGER NOT NULL, name VARCHAR NOT NULL, class_id VARCHAR NOT NULL, "
+    "PRIMARY KEY (id), FOREIGN KEY(class_id) REFERENCES classes (id))",
+    "CREATE TABLE students (id VARCHAR NOT NULL, name VARCHAR NOT NULL, grade INTEGER NOT NULL, "
+    "class_id VARCHAR NOT NULL, section VARCHAR NOT NULL, gpa FLOAT, attendance_percentage FLOAT, "
+    "attendance_days VARCHAR, homework_points INTEGER, homework_completed VARCHAR, "
+    "academic_performance VARCHAR, ai_insights VARCHAR, PRIMARY KEY (id))",
+]
+
+def test_upgrade_baseline_database(tmp_path):
+    """Test that an unversioned edutrack.db gains indexes, constraints and keeps its rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'edutrack.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO classes VALUES ('C101', 'Mathematics')"))
+        connection.execute(text("INSERT INTO sections (name, class_id) VALUES ('A', 'C101'), ('A', 'C101'), ('B', 'C101')"))
+        connection.execute(text(
+            "INSERT INTO students VALUES ('ST0001', 'Jane Smith', 10, 'C101', 'A', 3.5, 95.0, "
+            "'19/20', 95, '19/20', '{\"rank\": \"Top 10%\", \"tests\": {\"Quiz 1\": \"85%\"}, "
+            "\"homework\": {\"HW 1\": \"90%\"}}', '{}')"
+        ))
+
+    assert upgrade(engine) == LATEST_VERSION
+
+    inspector = inspect(engine)
+    assert "ix_students_class_id" in {index["name"] for index in inspector.get_indexes("students")}
+    assert "uq_sections_class_id_name" in {index["name"] for index in inspector.get_indexes("sections")}
+    assert inspector.get_foreign_keys("students")[0]["referred_table"] == "classes"
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == LATEST_VERSION
+        assert connection.execute(text("SELECT COUNT(*) FROM sections")).scalar() == 2
+        assert connection.execute(text("SELECT name FROM students")).scalar() == "Jane Smith"
+        grades = connection.execute(text("SELECT grade_type, name, percentage FROM grades ORDER BY id")).fetchall()
+        assert [tuple(row) for row in grades] == [("test", "Quiz 1", 85), ("homework", "HW 1", 90)]
+        performance = connection.execute(text("SELECT academic_performance FROM students")).scalar()
+        assert json.loads(performance) == {"rank": "Top 10%"}
+        assert connection.execute(text("SELECT value FROM id_sequences WHERE name = 'students'")).scalar() == 1
+
+    # Running again is a no-op
+    assert upgrade(engine) == LATEST_VERSION
+
+def test_init_db_keeps_existing_data(tmp_path, monkeypatch):
+    """Test that startup creates missing tables once and never wipes data"""
+    from backend.app.models import database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'edutrack.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    with engine.begin() as connection:
+        assert get_schema_version(connection) == LATEST_VERSION
+        connection.execute(text("INSERT INTO classes VALUES ('C101', 'Mathematics')"))
+
+    # A restart leaves the data alone
+    database.init_db()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM classes")).scalar() == "Mathematics"
+
+def test_seed_command(tmp_path):
+    """Test that sample data is loaded only through the CLI, and only into an empty database"""
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'edutrack.db'}"}
+    env.pop("TESTING", None)
+
+    def seed(*args):
+        subprocess.run([sys.executable, "-m", "backend.app.models.add_data", *args], cwd=root, env=env, check=True)
+
+    engine = create_engine(env["DATABASE_URL"])
+    seed()
+    with engine.connect() as connection:
+        first = connection.execute(text("SELECT name FROM students ORDER BY id")).scalars().all()
+    assert len(first) == 30
+
+    seed()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM students ORDER BY id")).scalars().all() == first
+
+    seed("--reset")
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM students")).scalar() == 30
+        assert connection.execute(text("SELECT version FROM data_versions WHERE name = 'catalog'")).scalar() == 2
@@ -0,0 +1,86 @@
+import pytest
+from backend.app.services.rank_engine import RankEngine, UNRANKED
+
+def test_ranks_are_relative_to_cohort():
+    """Test that students are ranked only against their class and grade level"""
+    engine = RankEngine()
+    engine.load([(f"ST{i:04d}", "C101", 10, 2.0 + i * 0.1) for i in range(20)])
+    engine.update("OTHER", "C102", 10, 1.0)
+
+    assert engine.top_percent("ST0019") == 5.0
+    assert engine.rank("ST0019") == "Top 5%"
+    assert engine.rank("ST0018") == "Top 10%"
+    assert engine.rank("ST0015") == "Top 25%"
+    assert engine.rank("ST0010") == "Top 50%"
+    assert engine.rank("ST0000") == "Average"
+    # Alone in its cohort, so at the top regardless of GPA
+    assert engine.top_percent("OTHER") == 100.0
+    assert engine.rank("MISSING") is None
+
+def test_updates_move_students_and_share_ties():
+    """Test that GPA changes re-rank in place and tied students share a position"""
+    engine = RankEngine()
+    engine.load([("A", "C101", 9, 3.0), ("B", "C101", 9, 3.0), ("C", "C101", 9, 2.0), ("D", "C101", 9, 1.0)])
+    assert engine.top_percent("A") == engine.top_percent("B") == 25.0
+
+    engine.update("D", "C101", 9, 4.0)
+    assert engine.top_percent("D") == 25.0
+    assert engine.top_percent("A") == 50.0
+
+    engine.remove("D")
+    assert engine.top_percent("A") == pytest.approx(100 / 3)
+    assert engine.top_percent("C") == 100.0
+
+def test_small_cohorts_are_unranked():
+    """Test that cohorts too small for a meaningful percentile get no percentile rank"""
+    engine = RankEngine(min_cohort_size=5)
+    engine.update("ALONE", "C101", 10, 4.0)
+    assert engine.rank("ALONE") == UNRANKED
+    assert engine.rank_with("ALONE", "C101", 10, 1.0) == UNRANKED
+    assert engine.rank_with("NEW", "C102", 10, 4.0) == UNRANKED
+
+    engine.load([(f"ST{i:04d}", "C101", 10, 2.0 + i * 0.1) for i in range(3)], class_ids=["C101"])
+    assert engine.rank_with("NEW", "C101", 10, 1.0) == UNRANKED
+    engine.update("ST0003", "C101", 10, 1.0)
+    assert engine.rank_with("NEW", "C101", 10, 4.0) == "Top 25%"
+    engine.update("NEW", "C101", 10, 4.0)
+    assert engine.rank("NEW") == "Top 25%"
+    assert engine.rank("ST0003") == "Average"
+
+def test_rank_with_matches_update_without_changing_engine():
+    """Test that a hypothetical rank equals the rank after the update, and the engine is untouched"""
+    rows = [(f"ST{i:04d}", "C101", 10, 2.0 + i * 0.1) for i in range(20)] + [("OTHER", "C102", 10, 3.5)]
+    engine = RankEngine()
+    engine.load(rows)
+
+    cases = [("ST0000", "C101", 4.0), ("ST0019", "C101", 1.0), ("NEW", "C101", 3.9), ("ST0010", "C101", 3.0),
+             ("ST0000", "C102", 3.6)]
+    for student_id, class_id, gpa in cases:
+        before = engine.rank(student_id)
+        hypothetical = engine.rank_with(student_id, class_id, 10, gpa)
+        assert engine.rank(student_id) == before
+
+        updated = RankEngine()
+        updated.load(rows)
+        updated.update(student_id, class_id, 10, gpa)
+        assert hypothetical == updated.rank(student_id)
+
+    assert engine.rank("NEW") is None
+
+def test_reloads_only_stale_classes():
+    """Test that one class can be reloaded and that only consecutive versions advance the engine"""
+    engine = RankEngine()
+    engine.load([("A", "C101", 10, 3.0), ("B", "C101", 10, 2.0), ("X", "C102", 10, 1.0)])
+    engine.versions = {"C101": 3, "C102": 1}
+
+    assert engine.stale_classes({"C101": 3, "C102": 1}) == set()
+    assert engine.stale_classes({"C101": 4, "C102": 1, "C103": 1}) == {"C101", "C103"}
+
+    engine.load([("B", "C101", 10, 4.0)], class_ids=["C101"])
+    assert engine.rank("A") is None
+    assert engine.top_percent("B") == 100.0
+    assert engine.rank("X") is not None
+
+    engine.advance("C102", 2)
+    engine.advance("C101", 5)
+    assert engine.versions == {"C101": 3, "C102": 2}
@@ -0,0 +1,67 @@
+import asyncio
+from backend.app.routers.chat import ConnectionManager
+from backend.app.services.session_store import SQLiteSessionStore, InMemorySessionStore
+
+def test_sqlite_session_store_round_trip(tmp_path):
+    """Test that sessions and contexts persist in the SQLite store and expire"""
+    async def scenario():
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        await store.save("client-1", {"context_hash": "abc", "history": [{"role": "user", "content": "hi"}]})
+        await store.save_context("abc", b"compressed")
+        loaded = await store.load("client-1")
+        blob = await store.load_context("abc")
+
+        expired = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=-1)
+        await expired.save("client-2", {"context_hash": None, "history": []})
+        missing = await store.load("client-2")
+        await store.close()
+        await expired.close()
+        return loaded, blob, missing
+
+    loaded, blob, missing = asyncio.run(scenario())
+    assert loaded == {"context_hash": "abc", "history": [{"role": "user", "content": "hi"}]}
+    assert blob == b"compressed"
+    assert missing is None
+
+def test_sqlite_session_store_purges_expired_rows(tmp_path):
+    """Test that expired sessions and contexts are deleted from the file every N saves"""
+    async def scenario():
+        expired = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=-1)
+        await expired.save("old-client", {"context_hash": "old", "history": []})
+        await expired.save_context("old", b"compressed")
+        await expired.close()
+
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"), purge_every=2)
+        await store.save("client-1", {"context_hash": None, "history": []})
+        before = await store._run("SELECT COUNT(*) FROM chat_sessions")
+        await store.save("client-2", {"context_hash": None, "history": []})
+        sessions = await store._run("SELECT COUNT(*) FROM chat_sessions")
+        contexts = await store._run("SELECT COUNT(*) FROM chat_contexts")
+        await store.close()
+        return before[0], sessions[0], contexts[0]
+
+    assert asyncio.run(scenario()) == (2, 2, 0)
+
+def test_session_resumes_on_another_worker(tmp_path):
+    """Test that a reconnect handled by a different manager restores context and history"""
+    async def scenario():
+        path = str(tmp_path / "sessions.db")
+        first_worker = ConnectionManager(SQLiteSessionStore(path))
+        await first_worker.store_context("teacher-1", "Roster for C101")
+        await first_worker.add_exchange("teacher-1", "Who is at risk?", "Nobody")
+        first_worker.disconnect("teacher-1")
+
+        second_worker = ConnectionManager(SQLiteSessionStore(path))
+        await second_worker.restore_session("teacher-1")
+        return second_worker.get_context("teacher-1"), second_worker.get_history("teacher-1")
+
+    context, history = asyncio.run(scenario())
+    assert context == "Roster for C101"
+    assert history == [
+        {"role": "user", "content": "Who is at risk?"},
+        {"role": "assistant", "content": "Nobody"}
+    ]
+
+def test_in_memory_store_is_the_default():
+    """Test that the manager falls back to a process-local store"""
+    assert isinstance(ConnectionManager().session_store, InMemorySessionStore)
@@ -0,0 +1,27 @@
+import json
+from backend.app.services.token_budget import count_tokens, fit_context_to_budget
+
+def make_roster_context(num_students):
+    rows = "".join(
+        f"<tr><td>ST{i:04d}</td><td>Student{i} Name</td><td>{2.0 + (i % 20) / 10:.1f}</td></tr>"
+        for i in range(1, num_students + 1)
+    )
+    markup = f"<h1>Mathematics Roster</h1><table><tbody>{rows}</tbody></table>"
+    return json.dumps({"html": markup, "text": "Mathematics Roster"})
+
+def test_small_context_is_unchanged():
+    """Test that a context within budget is passed through as-is"""
+    context = make_roster_context(3)
+    assert fit_context_to_budget(context, "How is ST0002 doing?", budget=10000) == context
+
+def test_large_context_keeps_matching_rows():
+    """Test that trimming keeps rows mentioning the student asked about"""
+    context = make_roster_context(2000)
+    budget = 300
+    trimmed = fit_context_to_budget(context, "How is Student1500 doing?", budget=budget)
+
+    assert count_tokens(trimmed) < count_tokens(context)
+    assert count_tokens(trimmed) <= budget + 50
+    assert "ST1500 | Student1500 Name" in trimmed
+    assert "Mathematics Roster" in trimmed
+    assert "lines omitted" in trimmed
@@ -24,10 +24,15 @@ const Chat = () => {
     { type: 'agent', text: '• Understanding student performance\n• Tracking student progress\n• Generating insights about your class' }
   ]);
   const [isLoading, setIsLoading] = useState(false);
+  const [queuePosition, setQueuePosition] = useState(null);
   const [webSocket, setWebSocket] = useState(null);
   const [initialContextSent, setInitialContextSent] = useState(false);
   const [isScrolled, setIsScrolled] = useState(false);
   const clientId = useRef(Date.now().toString());
+  // Last page context sent to the server and the hash it acknowledged
+  const contextRef = useRef({ content: null, hash: null });
+  // request_id of the question awaiting an answer; frames for older ones are ignored
+  const requestIdRef = useRef(null);
   const theme = useTheme();
   const isMobile = useMediaQuery(theme.breakpoints.down('sm'));
   
@@ -72,6 +77,36 @@ const Chat = () => {
     return JSON.stringify(context);
   };
 
+  // Single splice turning previous into next (offsets in UTF-16 code units)
+  const diffContext = (previous, next) => {
+    const maxLength = Math.min(previous.length, next.length);
+    let start = 0;
+    while (start < maxLength && previous[start] === next[start]) start++;
+    let suffix = 0;
+    while (
+      suffix < maxLength - start &&
+      previous[previous.length - 1 - suffix] === next[next.length - 1 - suffix]
+    ) suffix++;
+    return { start, end: previous.length - suffix, text: next.slice(start, next.length - suffix) };
+  };
+
+  const sendContext = (ws, force = false) => {
+    const content = getPageContext();
+    const { content: lastContent, hash } = contextRef.current;
+    if (!force && hash && lastContent === content) {
+      ws.send(JSON.stringify({ type: 'context', hash }));
+    } else if (!force && hash && lastContent !== null) {
+      ws.send(JSON.stringify({
+        type: 'context_patch',
+        base_hash: hash,
+        ops: [diffContext(lastContent, content)]
+      }));
+    } else {
+      ws.send(JSON.stringify({ type: 'context', content }));
+    }
+    contextRef.current = { content, hash: null };
+  };
+
   useEffect(() => {
     if (open && !webSocket) {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
@@ -82,17 +117,58 @@ const Chat = () => {
       ws.onopen = () => {
         console.log('WebSocket Connected');
         if (!initialContextSent) {
-          const pageContext = getPageContext();
-          ws.send(JSON.stringify({
-            type: 'context',
-            content: pageContext
-          }));
+          sendContext(ws);
           setInitialContextSent(true);
         }
       };
 
       ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
+        if (data.type === 'context_ack') {
+          contextRef.current = { ...contextRef.current, hash: data.hash };
+          return;
+        }
+        if (data.type === 'context_missing') {
+          // Server no longer has our base context; send the full page again
+          sendContext(ws, true);
+          return;
+        }
+        if (data.request_id && data.request_id !== requestIdRef.current) {
+          // Cancelled or superseded question; its frames no longer apply
+          return;
+        }
+        if (data.type === 'queued') {
+          setQueuePosition(data.position);
+          return;
+        }
+        setQueuePosition(null);
+        if (data.type === 'cancelled') {
+          setIsLoading(false);
+          return;
+        }
+        if (data.type === 'delta') {
+          // Append streamed chunks to the reply currently being built
+          setMessages(prev => {
+            const last = prev[prev.length - 1];
+            if (last && last.streaming) {
+              return [...prev.slice(0, -1), { ...last, text: last.text + data.message }];
+            }
+            return [...prev, { type: 'agent', text: data.message, streaming: true }];
+          });
+          setIsLoading(false);
+          return;
+        }
+        if (data.type === 'done') {
+          setMessages(prev => {
+            const last = prev[prev.length - 1];
+            if (last && last.streaming) {
+              return [...prev.slice(0, -1), { type: 'agent', text: data.message }];
+            }
+            return [...prev, { type: 'agent', text: data.message }];
+          });
+          setIsLoading(false);
+          return;
+        }
         setMessages(prev => [...prev, { type: 'agent', text: data.message }]);
         setIsLoading(false);
       };
@@ -135,9 +211,15 @@ const Chat = () => {
       setMessages(prev => [...prev, { type: 'user', text: message }]);
       setIsLoading(true);
       
+      // Only send the page again (as a patch) if it changed since the last send
+      if (getPageContext() !== contextRef.current.content) {
+        sendContext(webSocket);
+      }
+      requestIdRef.current = Date.now().toString();
       webSocket.send(JSON.stringify({
         type: 'message',
-        content: message
+        content: message,
+        request_id: requestIdRef.current
       }));
       setMessage('');
     }
@@ -306,7 +388,9 @@ const Chat = () => {
                     borderRadius: '15px 15px 15px 5px',
                   }}
                 >
-                  <Typography variant="body1">Thinking...</Typography>
+                  <Typography variant="body1">
+                    {queuePosition ? `Queued (position ${queuePosition})...` : 'Thinking...'}
+                  </Typography>
                 </Paper>
               </Box>
             )}
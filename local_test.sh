@@ -90,6 +90,10 @@ if [ "$RUN_TESTS" = true ]; then
     echo "==============================================="
 fi
 
+# Sample data is no longer loaded on startup; this only fills an empty database
+echo "Loading sample data..."
+python3 -m backend.app.models.add_data
+
 echo "Starting backend server..."
 python3 server.py &
 backend_pid=$!
@@ -4,14 +4,26 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from backend.app.routers import health, version, db, chat
 from backend.app.models.database import init_db
+from backend.app.services.anthropic_client import init_anthropic_client, close_anthropic_client
+from backend.app.services.aggregates import start_consistency_checker, stop_consistency_checker
+from backend.app.services.fast_json import DefaultJSONResponse
 import uvicorn
 
-app = FastAPI()
+app = FastAPI(default_response_class=DefaultJSONResponse)
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    init_anthropic_client()
+    start_consistency_checker()
+
+# Release pooled upstream connections and background tasks on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consistency_checker()
+    await close_anthropic_client()
+    await chat.manager.session_store.close()
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,6 +32,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include WebSocket router first (before static files)